@@ -0,0 +1,209 @@
+# single command line entry point for the cryowurst data pipeline:
+# python cryowurst.py ingest = decode new raw cloudloop data to the processed data store (cryowurst_raw_data_process.py)
+# python cryowurst.py plot = draw the figures from the processed data (cryowurst_data_allplots.py)
+# python cryowurst.py watch = keep the processed data and figures up to date as new raw data arrive (cryowurst_watch.py)
+# python cryowurst.py status = show what has been ingested and whether anything is waiting to be ingested
+# run any of them with --help for their options. The old scripts still work, and take the same options.
+# pandas, matplotlib etc. are only imported by the subcommands that need them, so quick runs start quickly:
+# status only reads the ingest manifest, and ingest stops before loading anything if there are no new files.
+# the old scripts run the same subcommands through this module, passing themselves in, so they aren't imported twice.
+
+import argparse
+import datetime
+import glob
+import json
+import os
+import sys
+from cryowurst_manifest import (working_directory, raw_data_directory, processed_data_directory, manifest_file_name,
+                                load_manifest, changed_raw_files)
+
+
+store_directory = processed_data_directory+'satellite_data/'
+output_path = working_directory+'/plots/'
+report_file_name = processed_data_directory+'run_report.jsonl'
+
+#region subcommands
+def set_stage_settings (args):
+    from cryowurst_stages import stage_settings
+    stage_settings['profile_stage'] = args.profile
+    stage_settings['trace_memory'] = args.trace_memory
+
+def run_ingest (args, parser, process=None):
+    # process = the cryowurst_raw_data_process module (imported here if None)
+    from cryowurst_stages import stage, write_run_report
+    set_stage_settings(args)
+    # nothing to do if every raw file has already been ingested - checked before pandas is loaded
+    if not args.full and not args.csv and os.path.exists(store_directory):
+        with stage('check_new_files') as record:
+            manifest = load_manifest(manifest_file_name)
+            n_new_files = len(changed_raw_files(raw_data_directory, manifest)) if len(manifest['files']) > 0 else None
+            record['rows'] = n_new_files
+        if n_new_files == 0:
+            write_run_report(args.report, 'ingest')
+            print('All done! No new or changed files.')
+            return
+
+    if process is None:
+        import cryowurst_raw_data_process as process
+    summary = process.ingest(full=args.full, export_csv=args.csv, chunk_lines=args.chunk_lines, jobs=args.jobs)
+    write_run_report(args.report, 'ingest')
+    print('All done! '+str(len(summary['new_files']))+' new or changed file(s).')
+
+def run_plot (args, parser, allplots=None):
+    # allplots = the cryowurst_data_allplots module (imported here if None)
+    if allplots is None:
+        import cryowurst_data_allplots as allplots
+    from cryowurst_stages import stage, write_run_report
+    set_stage_settings(args)
+    allplots.render_settings['decimate'] = None if args.decimate == 'none' else args.decimate
+    allplots.render_settings['formats'] = args.formats
+    allplots.render_settings['rasterize'] = not args.vector_markers
+
+    #create a /plots/ directory if there isn't one already
+    if not os.path.exists(allplots.output_path):
+        os.makedirs(allplots.output_path)
+
+    figure_names = args.only or list(allplots.figures)
+    plot_data = allplots.load_plot_data(figure_names, pressure_correction=args.pressure_correction)
+    with stage('render') as record:
+        allplots.render_figures(figure_names, plot_data, jobs=args.jobs)
+        record['rows'] = len(figure_names)
+    write_run_report(args.report, 'plot')
+    print('All done! '+str(len(figure_names))+' figure(s) saved in '+allplots.output_path+'.')
+
+def run_watch (args, parser, cryowurst_watch=None):
+    # cryowurst_watch = the cryowurst_watch module (imported here if None)
+    if cryowurst_watch is None:
+        import cryowurst_watch
+    cryowurst_watch.watch(args.only, args.interval, formats=args.formats, jobs=args.jobs, chunk_lines=args.chunk_lines,
+                          pressure_correction=args.pressure_correction)
+
+def format_unix_time (seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')+' UTC'
+
+def format_file_time (file_name):
+    return datetime.datetime.fromtimestamp(os.path.getmtime(file_name)).strftime('%Y-%m-%d %H:%M:%S')
+
+def run_status (args, parser):
+    # uses only the standard library: the manifest, file listings and the run report
+    manifest = load_manifest(manifest_file_name)
+    cloudloop_files = glob.glob(raw_data_directory+'*cloudloop*.csv')
+    weather_files = glob.glob(raw_data_directory+'300234068884730*.txt')
+    pending_files = changed_raw_files(raw_data_directory, manifest)
+    print('raw data: '+str(len(cloudloop_files))+' cloudloop file(s), '+str(len(weather_files))+' weather station file(s) in '+raw_data_directory)
+    print('waiting to be ingested: '+str(len(pending_files))+' new or changed cloudloop file(s)')
+    for file in pending_files:
+        print('  '+os.path.basename(file))
+
+    if not os.path.exists(store_directory):
+        print('processed data: none yet, run ingest')
+    else:
+        print('processed data: '+str(len(manifest['files']))+' file(s) ingested into '+processed_data_directory)
+        for uid, last_time in sorted(manifest['last_time'].items()):
+            print('  '+uid+' last packet '+format_unix_time(last_time))
+
+    plot_files = glob.glob(output_path+'*.png')
+    if len(plot_files) == 0:
+        print('plots: none yet, run plot')
+    else:
+        oldest_plot = min(plot_files, key=os.path.getmtime)
+        print('plots: '+str(len(plot_files))+' figure(s) in '+output_path+', oldest saved '+format_file_time(oldest_plot))
+        inputs = weather_files + [file for file in [manifest_file_name] if os.path.exists(file)]
+        if any(os.path.getmtime(file) > os.path.getmtime(oldest_plot) for file in inputs):
+            print('  some figures are older than the data, run plot')
+
+    if os.path.exists(report_file_name):
+        last_runs = {}
+        with open(report_file_name) as report_file:
+            for line in report_file:
+                record = json.loads(line)
+                last_runs[record['script']] = record['run']
+        for script, run in sorted(last_runs.items()):
+            print('last '+script+' run: '+run)
+#endregion
+
+#region arguments
+def add_stage_arguments (parser, example_stage):
+    parser.add_argument('--report', default=report_file_name,
+                        help='run report to add the time and memory use of each stage to (default: data/processed/run_report.jsonl)')
+    parser.add_argument('--profile', metavar='STAGE',
+                        help='save a cProfile profile of this stage next to the run report, e.g. '+example_stage+' (use with --jobs 1)')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='also record the peak memory allocated in each stage (slower)')
+
+def make_parser (command=None, allplots=None):
+    # the figure names and other choices of plot and watch come from the plotting modules, so those are only
+    # imported when command is plot or watch. other subcommands start without pandas or matplotlib
+    # allplots = the cryowurst_data_allplots module (imported here if None and needed)
+    figure_names = decimate_choices = pressure_correction_choices = None
+    if command in ('plot', 'watch'):
+        if allplots is None:
+            import cryowurst_data_allplots as allplots
+        from cryowurst_decimate import decimation_methods
+        figure_names = list(allplots.figures)
+        decimate_choices = decimation_methods+['none']
+        pressure_correction_choices = allplots.pressure_correction_sources
+
+    parser = argparse.ArgumentParser(description='cryowurst data pipeline')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    ingest_parser = subparsers.add_parser('ingest', help='decode raw cloudloop data to the processed data store',
+                                          description='decode raw cloudloop data to the processed data store')
+    ingest_parser.add_argument('--full', action='store_true',
+                               help='reprocess every cloudloop file instead of only new or changed ones')
+    ingest_parser.add_argument('--csv', action='store_true',
+                               help='also export all processed data to data/processed/satellite_data_processed.csv')
+    ingest_parser.add_argument('--chunk-lines', type=int, default=20000,
+                               help='number of satellite lines to decode at a time (default: 20000)')
+    ingest_parser.add_argument('--jobs', type=int, default=None,
+                               help='number of worker processes (default: one per file, up to the number of cores)')
+    add_stage_arguments(ingest_parser, 'decode_packets')
+    ingest_parser.set_defaults(run=run_ingest, command_parser=ingest_parser)
+
+    plot_parser = subparsers.add_parser('plot', help='plot processed wurst data', description='plot processed wurst data')
+    plot_parser.add_argument('--only', nargs='+', choices=figure_names, metavar='FIGURE',
+                             help='only render these figures (default: all of them), e.g. wurst_pressure temp_depth')
+    plot_parser.add_argument('--jobs', type=int, default=None,
+                             help='number of worker processes (default: one per figure, up to the number of cores)')
+    plot_parser.add_argument('--formats', nargs='+', metavar='FORMAT',
+                             help="save every figure in these formats (default: each figure's own list), e.g. png svg pdf")
+    plot_parser.add_argument('--vector-markers', action='store_true',
+                             help='keep every marker as a vector path in svg and pdf output, instead of rasterizing dense layers')
+    plot_parser.add_argument('--decimate', choices=decimate_choices, default='minmax',
+                             help='how to downsample long time series to the figure width: minmax, lttb or none (default: minmax)')
+    plot_parser.add_argument('--pressure-correction', choices=pressure_correction_choices, default='logger',
+                             help='air pressure to correct wurst pressure for: logger (measured by the receiver) or station (weather station) (default: logger)')
+    add_stage_arguments(plot_parser, 'draw:temp_depth')
+    plot_parser.set_defaults(run=run_plot, command_parser=plot_parser)
+
+    watch_parser = subparsers.add_parser('watch', help='ingest new raw data and re-render the plots it affects, as it arrives',
+                                         description='ingest new raw data and re-render the plots it affects, as it arrives')
+    watch_parser.add_argument('--interval', type=float, default=60,
+                              help='seconds between checks of the raw data directory (default: 60)')
+    watch_parser.add_argument('--only', nargs='+', choices=figure_names, metavar='FIGURE',
+                              help='only keep these figures up to date (default: all of them), e.g. wurst_pressure temp_depth')
+    watch_parser.add_argument('--formats', nargs='+', metavar='FORMAT',
+                              help="save every figure in these formats (default: each figure's own list), e.g. png")
+    watch_parser.add_argument('--jobs', type=int, default=None,
+                              help='number of worker processes for decoding and rendering (default: up to the number of cores)')
+    watch_parser.add_argument('--chunk-lines', type=int, default=20000,
+                              help='number of satellite lines to decode at a time (default: 20000)')
+    watch_parser.add_argument('--pressure-correction', choices=pressure_correction_choices, default='logger',
+                              help='air pressure to correct wurst pressure for: logger (measured by the receiver) or station (weather station) (default: logger)')
+    watch_parser.set_defaults(run=run_watch, command_parser=watch_parser)
+
+    status_parser = subparsers.add_parser('status', help='show what has been ingested and what is waiting',
+                                          description='show what has been ingested and what is waiting')
+    status_parser.set_defaults(run=run_status, command_parser=status_parser)
+    return parser
+#endregion
+
+def main (argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    command = next((arg for arg in argv if not arg.startswith('-')), None)
+    args = make_parser(command).parse_args(argv)
+    args.run(args, args.command_parser)
+
+if __name__ == '__main__':
+    main()
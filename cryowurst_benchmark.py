@@ -0,0 +1,212 @@
+# benchmarks each stage of the pipeline on synthetic data (see cryowurst_synthetic.py), at any scale.
+# stages:
+# read_hex = reading the satellite hex lines of every cloudloop file
+# decode = decoding all packets in memory (cryowurst_raw_data_process.decode_packets)
+# ingest = decoding every file and merging it into an empty processed data store, as cryowurst_raw_data_process.py does
+# load = reading all processed data back from the store
+# parse_processed_times = parsing the time column of the .csv export
+# parse_weather_times = parsing weather station times and converting them to UTC
+# load_weather = reading the weather station files
+# prepare = deriving the plot data (pressure correction, instrument fields, split by wurst)
+# figure:<name> = drawing and saving each figure of cryowurst_data_allplots.py
+# for each stage the best wall time of --repeat runs, the peak memory of one more run (python and numpy allocations,
+# traced with tracemalloc) and the throughput (packets, lines or rows per second) are reported.
+# every run is appended to history.jsonl in --output-directory (benchmarks/ by default, which is not tracked by git).
+# Run with --save-baseline to keep the results as the baseline in baseline.json there. Later runs at the same scale
+# are compared with it, and any stage more than --tolerance slower is reported as a regression (and the exit code is 1).
+# run as e.g. python cryowurst_benchmark.py --instruments 30 --days 120
+
+import argparse
+import datetime
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import cryowurst_raw_data_process as process
+import cryowurst_data_allplots as allplots
+from cryowurst_store import read_processed_store, processed_time_format
+from cryowurst_weather import read_weather_header, read_weather_file, parse_weather_times, weather_time_column
+from cryowurst_instruments import load_instrument_registry
+from cryowurst_synthetic import generate_dataset
+
+
+working_directory = os.path.dirname(os.path.abspath(__file__))
+benchmark_directory = working_directory+'/benchmarks/'
+# stages that are slower than the baseline by less than this many seconds are not counted as regressions,
+# so timing noise on very quick stages doesn't fail the run
+regression_min_seconds = 0.01
+
+#region measuring
+def measure (stage, repeat=3):
+    # runs stage() repeat times for the best wall time, then once more with tracemalloc for the peak memory
+    # returns the result of the last run, the best time in seconds and the peak memory in MB
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        stage()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    tracemalloc.start()
+    try:
+        result = stage()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, best, peak/1e6
+
+def stage_result (seconds, peak_mb, items, unit):
+    # one line of the report: time, memory and throughput of a stage
+    return {'seconds': seconds, 'peak_mb': peak_mb, 'items': items, 'unit': unit,
+            'per_second': items/seconds if seconds > 0 else None}
+#endregion
+
+#region stages
+def run_benchmarks (dataset, directory, repeat=3, formats=None, jobs=1):
+    # runs every stage on a synthetic dataset. returns a dict of stage name -> stage_result
+    results = {}
+    cloudloop_files = dataset['cloudloop_files']
+    processed_data_directory = os.path.join(directory, 'data', 'processed')+'/'
+    store_directory = processed_data_directory+'satellite_data/'
+
+    def read_hex ():
+        return [lines for file in cloudloop_files for lines in process.read_hex_chunks(file, 20000)]
+    chunks, seconds, peak_mb = measure(read_hex, repeat)
+    hex_lines = np.concatenate(chunks)
+    results['read_hex'] = stage_result(seconds, peak_mb, len(hex_lines), 'lines')
+
+    tables, seconds, peak_mb = measure(lambda: process.decode_packets(hex_lines), repeat)
+    results['decode'] = stage_result(seconds, peak_mb, len(tables['satellite_data']), 'packets')
+
+    def ingest ():
+        # every run starts from an empty store
+        for packet_type in process.packet_types.values():
+            process.clear_processed_store(processed_data_directory+packet_type['table']+'/')
+        os.makedirs(processed_data_directory, exist_ok=True)
+        spool_directory = tempfile.mkdtemp(prefix='spool-', dir=processed_data_directory)
+        try:
+            spool_chunks, _ = process.decode_files_to_spool(cloudloop_files, spool_directory, 20000, jobs)
+            n_new_packets, _, _, _ = process.merge_spool_into_store(spool_chunks, processed_data_directory, {})
+        finally:
+            shutil.rmtree(spool_directory, ignore_errors=True)
+        return n_new_packets
+    n_new_packets, seconds, peak_mb = measure(ingest, repeat)
+    results['ingest'] = stage_result(seconds, peak_mb, n_new_packets['satellite_data'], 'packets')
+
+    all_data, seconds, peak_mb = measure(lambda: read_processed_store(store_directory), repeat)
+    results['load'] = stage_result(seconds, peak_mb, len(all_data), 'rows')
+
+    time_strings = all_data['time'].dt.strftime(processed_time_format)
+    _, seconds, peak_mb = measure(lambda: pd.to_datetime(time_strings, format=processed_time_format), repeat)
+    results['parse_processed_times'] = stage_result(seconds, peak_mb, len(time_strings), 'rows')
+
+    weather_files = dataset['weather_files']
+    utc_offset_minutes, _ = read_weather_header(weather_files[0])
+    weather_data, seconds, peak_mb = measure(
+        lambda: pd.concat([read_weather_file(file) for file in weather_files], ignore_index=True), repeat)
+    results['load_weather'] = stage_result(seconds, peak_mb, len(weather_data), 'rows')
+
+    date_time = weather_data[weather_time_column]
+    _, seconds, peak_mb = measure(lambda: parse_weather_times(date_time, utc_offset_minutes), repeat)
+    results['parse_weather_times'] = stage_result(seconds, peak_mb, len(date_time), 'rows')
+
+    instruments = load_instrument_registry(dataset['registry_file'])
+    plot_data, seconds, peak_mb = measure(lambda: allplots.prepare_plot_data(all_data, weather_data, instruments), repeat)
+    results['prepare'] = stage_result(seconds, peak_mb, len(plot_data['wurst_data']), 'rows')
+
+    # figures are saved in the benchmark directory, not in plots/
+    allplots.output_path = os.path.join(directory, 'plots')+'/'
+    os.makedirs(allplots.output_path, exist_ok=True)
+    settings = dict(allplots.render_settings, formats=formats)
+    for name in allplots.figures:
+        _, seconds, peak_mb = measure(lambda: allplots.render_figure(name, plot_data, settings), repeat)
+        results['figure:'+name] = stage_result(seconds, peak_mb, 1, 'figures')
+    return results
+#endregion
+
+#region reporting
+def print_report (results):
+    print('{0:<28}{1:>10}{2:>12}{3:>22}'.format('stage', 'seconds', 'peak MB', 'throughput'))
+    for stage, result in results.items():
+        throughput = ''
+        if result['unit'] != 'figures' and result['per_second'] is not None:
+            throughput = '{0:.0f} {1}/s'.format(result['per_second'], result['unit'])
+        print('{0:<28}{1:>10.3f}{2:>12.1f}{3:>22}'.format(stage, result['seconds'], result['peak_mb'], throughput))
+
+def find_regressions (results, baseline, tolerance):
+    # stages that took more than (1 + tolerance) times as long as in the baseline (and regression_min_seconds longer)
+    # returns a list of (stage, seconds, baseline seconds)
+    regressions = []
+    for stage, result in results.items():
+        if stage in baseline['stages']:
+            baseline_seconds = baseline['stages'][stage]['seconds']
+            if (result['seconds'] > baseline_seconds*(1 + tolerance)
+                    and result['seconds'] - baseline_seconds > regression_min_seconds):
+                regressions.append((stage, result['seconds'], baseline_seconds))
+    return regressions
+#endregion
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='benchmark the decode, load and plot stages on synthetic data')
+    parser.add_argument('--instruments', type=int, default=4, help='number of wurste (default: 4)')
+    parser.add_argument('--days', type=float, default=30, help='number of days of data (default: 30)')
+    parser.add_argument('--samples-per-day', type=float, default=24,
+                        help='samples per day from each wurst (default: 24)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the synthetic data (default: 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs of each stage, best is reported (default: 3)')
+    parser.add_argument('--formats', nargs='+', metavar='FORMAT',
+                        help="save every figure in these formats (default: each figure's own list)")
+    parser.add_argument('--jobs', type=int, default=1, help='number of worker processes for the ingest stage (default: 1)')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='fraction slower than the baseline that counts as a regression (default: 0.25)')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='save the results as the baseline for later runs at the same scale')
+    parser.add_argument('--output-directory', default=benchmark_directory,
+                        help='where to keep history.jsonl and baseline.json (default: benchmarks/)')
+    parser.add_argument('--keep', metavar='DIRECTORY',
+                        help='generate the synthetic data in DIRECTORY and keep it (default: a temporary directory)')
+    args = parser.parse_args()
+
+    scale = {'instruments': args.instruments, 'days': args.days, 'samples_per_day': args.samples_per_day,
+             'seed': args.seed, 'formats': args.formats}
+    directory = args.keep or tempfile.mkdtemp(prefix='cryowurst-benchmark-')
+    try:
+        dataset = generate_dataset(directory, args.instruments, args.days, args.samples_per_day, seed=args.seed)
+        print('Benchmarking '+str(dataset['n_packets'])+' synthetic packets ('+str(args.instruments)+' wurste, '+
+              str(args.days)+' days, '+str(args.samples_per_day)+' samples per day).')
+        results = run_benchmarks(dataset, directory, repeat=args.repeat, formats=args.formats, jobs=args.jobs)
+    finally:
+        if args.keep is None:
+            shutil.rmtree(directory, ignore_errors=True)
+    print_report(results)
+
+    history_file_name = os.path.join(args.output_directory, 'history.jsonl')
+    baseline_file_name = os.path.join(args.output_directory, 'baseline.json')
+    if not os.path.exists(args.output_directory):
+        os.makedirs(args.output_directory)
+    run = {'time': datetime.datetime.now().isoformat(timespec='seconds'), 'scale': scale, 'stages': results}
+    with open(history_file_name, 'a') as history_file:
+        history_file.write(json.dumps(run)+'\n')
+
+    regressions = []
+    if os.path.exists(baseline_file_name):
+        with open(baseline_file_name) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['scale'] == scale:
+            regressions = find_regressions(results, baseline, args.tolerance)
+            for stage, seconds, baseline_seconds in regressions:
+                print('REGRESSION: '+stage+' took '+'{0:.3f}'.format(seconds)+' s, baseline '+
+                      '{0:.3f}'.format(baseline_seconds)+' s.')
+            print(str(len(regressions))+' regression(s) against the baseline from '+baseline['time']+'.')
+        else:
+            print('Baseline is at a different scale, not compared.')
+    if args.save_baseline:
+        with open(baseline_file_name, 'w') as baseline_file:
+            json.dump(run, baseline_file, indent=1)
+        print('Baseline saved to '+baseline_file_name+'.')
+    print('All done! Results added to '+history_file_name+'.')
+    sys.exit(1 if len(regressions) > 0 else 0)
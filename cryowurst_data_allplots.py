@@ -1,264 +1,427 @@
-# takes as input the output .csv file from cryowurst_raw_data_process.py (in this directory)
+# takes as input the processed data store from cryowurst_raw_data_process.py (data/processed/satellite_data/)
 # produces several plots of wurst data:
 # wurst_pressure.png = pressure readings from keller sensors on basal wurste
 # wurst_voltage.png = tadiran battery voltage on all wurste
 # logger_voltage.png = voltage on data logger
-# tilt_roll.png = absolute values of tilt and roll from TILT-05 OEM tilt sensor, all wurste
-# tilt_roll_depth.png = change in tilt and roll from initial value (colour) over depth and time for all wurste
-# temp_depth.png = temperature from TILT-05 OEM tilt sensor (colour) over depth and time for all wurste
+# temp_curves_together.png = temperature from TMP117 sensor over time for all wurste
+# temp_depth.png = temperature from TMP117 sensor (colour) over depth and time for all wurste
 
 # axis and caxis limits will need to be changed as the dataset size increases.
 
+# each figure is an independent render job. Data for all selected figures are loaded once, then the
+# figures are rendered in parallel in a process pool. Figures are drawn straight onto matplotlib Figure objects,
+# without pyplot, so no interactive backend is ever loaded.
+# run with --only to render some of the figures, e.g. --only wurst_pressure temp_depth
+# run with --jobs to set the number of worker processes (default: one per figure, up to the number of cores)
+# each figure is saved in the formats listed for it in the figures table (png and svg by default).
+# run with --formats to save every figure in other formats instead, e.g. --formats png to skip svg for routine runs.
+# in svg and pdf files, layers with many markers are rasterized, while axes and text stay as vectors.
+# run with --vector-markers to keep every marker as a vector path
+# long time series are downsampled to about two points per pixel column before plotting (see cryowurst_decimate.py).
+# run with --decimate lttb to use largest-triangle-three-buckets instead of min/max, or --decimate none to plot every point
+# wurst pressure is corrected for air pressure with the pressure measured by the receiver (logger) by default.
+# run with --pressure-correction station to use the weather station pressure at the time of each sample instead:
+# station pressure is joined onto every wurst sample from the nearest weather record (see attach_weather in
+# cryowurst_weather.py)
+
+import concurrent.futures
 import datetime
 from datetime import timezone
-import matplotlib
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import pandas as pd
 pd.options.mode.chained_assignment = None  # stop false positive chained assignment warnings
-import numpy as np
 import matplotlib.dates as mdates
-import cmocean
-import seaborn as sns
 import glob
-import os 
+import os
+import sys
+from cryowurst_store import read_processed_store, read_processed_csv
+from cryowurst_weather import load_weather_data, attach_weather, station_pressure_column, weather_tolerance
+from cryowurst_instruments import load_instrument_registry, load_colours, add_instrument_fields
+from cryowurst_decimate import decimate
+from cryowurst_stages import stage, add_stage_records
 #from scipy.interpolate import make_interp_spline
 
-#set current directory as the working directory, and create a /plots/ directory if there 
-# isn't one already
+#set current directory as the working directory
 working_directory = os.path.dirname(os.path.abspath(__file__))
 output_path = working_directory+'/plots/'
-if not os.path.exists(output_path):
-    os.makedirs(output_path)
-
-#region import data and format datetime
+store_directory = working_directory+'/data/processed/satellite_data/'
 satellite_file = working_directory+'/data/processed/satellite_data_processed.csv'
-all_data = pd.read_csv(satellite_file)
-
-good_time=[]
-for i in range(0, len(all_data)):
-#    all_data['time'][i] = datetime.datetime.strptime(all_data['time'][i], '%Y-%m-%d %H:%M:%S')  
-     good_time.append(datetime.datetime.strptime(all_data['time'][i], '%Y-%m-%d %H:%M:%S'))  
-all_data['time']=good_time
-#endregion
-
-#region combine available files from weather station data
-# weather data from Kaskawulsh weather station:
-# download latest .txt file from this address, and save in raw data directory 
-# https://datagarrison.com/users/300034012631040/300234068884730/
-weather_list = glob.glob(working_directory+'/data/raw/300234068884730*.txt')
-weather_list.sort()
-weather_data = pd.read_csv(weather_list[0], delimiter='\t', header=2, skipfooter=2, engine='python')
-for index in range(1, len(weather_list)):
-    filename = weather_list[index]
-    data = pd.read_csv(filename, delimiter='\t', header=2, skipfooter=2, engine='python')
-    weather_data = pd.concat([weather_data, data], ignore_index=True)
-
-good_time=[]
-#weather_data['datetime'] = 0
-for index in range(len(weather_data['Date_Time'])):
-    #weather_data['datetime'][index] = datetime.datetime.strptime(weather_data['Date_Time'][index], '%m/%d/%y %H:%M:%S')
-    good_time.append(datetime.datetime.strptime(weather_data['Date_Time'][index], '%m/%d/%y %H:%M:%S'))
-weather_data['datetime']=good_time
-#endregion
+weather_cache_directory = working_directory+'/data/processed/weather/'
 
-#region data processing
-#make sure data are in order of time
-all_data = all_data.sort_values(by=['time'])
-all_data = all_data.sort_values(by=['time'])
-
-#correct for local pressure, measured by receiver
-all_data['pressure']=all_data['pressure']-(all_data['logger_pressure']/1e9)
-
-# add wurst depths to dataframe
-all_data['depth'] = np.zeros(len(all_data))
-all_data['depth'].loc[all_data['UID']=='cf240002'] = 138
-all_data['depth'].loc[all_data['UID']=='cf240004'] = 157.8
-all_data['depth'].loc[all_data['UID']=='cf240007'] = 87.19 
-all_data['depth'].loc[all_data['UID']=='cf240008'] = 36.89 
-
-#separate out different wurste into separate dataframes
-#depth1=138m
-wurst2 = all_data[all_data['UID']=='cf240002']
-#depth4 = 157.8
-wurst4 = all_data[all_data['UID']=='cf240004']
-#depth7 = 87.19 
-wurst7 = all_data[all_data['UID']=='cf240007']
-#depth8 = 36.89
-wurst8 = all_data[all_data['UID']=='cf240008']
-    
-#get change in tilt for each wurst, relative to starting value
-wurst2['change_in_pitch']=wurst2['tilt_pitch']-wurst2['tilt_pitch'].values[0]
-wurst4['change_in_pitch']=wurst4['tilt_pitch']-wurst4['tilt_pitch'].values[0]
-wurst7['change_in_pitch']=wurst7['tilt_pitch']-wurst7['tilt_pitch'].values[0]
-wurst8['change_in_pitch']=wurst8['tilt_pitch']-wurst8['tilt_pitch'].values[0]
-
-wurst2['change_in_roll']=wurst2['tilt_roll']-wurst2['tilt_roll'].values[0]
-wurst4['change_in_roll']=wurst4['tilt_roll']-wurst4['tilt_roll'].values[0]
-wurst7['change_in_roll']=wurst7['tilt_roll']-wurst7['tilt_roll'].values[0]
-wurst8['change_in_roll']=wurst8['tilt_roll']-wurst8['tilt_roll'].values[0]
-
-#region set default colours for each instrument
-#grab colour list from style
-colours = sns.color_palette("husl", 8)
-wurst2_colour = colours[1]
-wurst4_colour = colours[3]
-wurst7_colour = colours[6]
-wurst8_colour = colours[7]
-temp_colour = colours[4]
-humidity_colour = colours[5]
-colour_adjust = -0.15
-wurst4_colour_3 = (colours[3][0]-colour_adjust, colours[3][1]-colour_adjust,colours[3][2]-colour_adjust)
-wurst4_colour_2 = (colours[3][0]+colour_adjust, colours[3][1]+colour_adjust,colours[3][2]+colour_adjust)
+#region settings
+#wurst colours and other colours come from the instrument registry (wurst_colours.toml)
+colours = load_colours()
+temp_colour = colours['temp']
+humidity_colour = colours['humidity']
 
 # define function for converting rgb colours to hex codes (useful for adjusting colours)
 def rgb_to_hex(rgb):
     return '#{:02x}{:02x}{:02x}'.format(int(rgb[0]*255), int(rgb[1]*255), int(rgb[2]*255))
-#endregion
-#endregion
-
-#region plotting time!
 
 #formatting settings:
 #set how far apart to plot x-axis ticks (can adjust this as more data comes in)
-hour_locator = 48 
+hour_locator = 48
 #set offset to leave a gap at start and end of plot
 axis_offset = datetime.timedelta(hours=24)
 #set marker size
-ms = 3 
+ms = 3
+
+#rasterize lines and marker layers on axes with more points than this in vector (svg, pdf) output
+rasterize_min_points = 500
+#resolution of the rasterized layers in vector output
+vector_raster_dpi = 300
+
+#where the air pressure that wurst pressure is corrected for comes from: the receiver (logger) or the weather station
+pressure_correction_sources = ['logger', 'station']
 
 #default min and max time on x axis (start of deployment until today)
 min_time = datetime.datetime(2024, 7, 22, 12, 0, 0)
 max_time = datetime.datetime.now(timezone.utc)
-
-#region plot wurst pressure plus data from weather station
-#fig_pressure, (ax_pressure, ax_temperature, ax_humidity) = plt.subplots(3,1, figsize=(12,12), sharex=True)
-fig_pressure, (ax_pressure, ax_logger_temperature, ax_air_temperature) = plt.subplots(3,1, figsize=(12,12), sharex=True)
-ax_pressure.plot(wurst2['time'], wurst2['pressure'], '.', label='CF240002, 138m', color=wurst2_colour, markersize=ms)
-ax_pressure.plot(wurst4['time'], wurst4['pressure'], '.', label='CF240004, 158m', color=wurst4_colour, markersize=ms)
-#ax_pressure.set_xlabel('date')
-ax_pressure.set_ylabel('pressure, bar')
-ax_pressure.set_title('wurst pressure')
-ax_pressure.legend(loc='lower right')
-ax_pressure.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
-ax_pressure.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-ax_pressure.set_xlim([min(wurst2['time'])-axis_offset, max(wurst2['time'])+axis_offset])
-ax_pressure.set_xlim([min_time, max_time])
-ax_pressure.set_ylim([2, 17])
-ax_pressure.xaxis.set_tick_params(rotation=90)
-
-#ax_humidity.plot(weather_data['datetime'], weather_data['RH_20339014_%'], '.', color=temp_colour)
-##ax_humidity.set_xlabel('date')
-#ax_humidity.set_ylabel('humidity, $^{\circ}\,C$')
-##ax_humidity.set_ylim([-25,25])
-#ax_humidity.set_xlim([min_time, max_time])
-#ax_humidity.set_title('relative humidity, %')
-#ax_humidity.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
-#ax_humidity.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-#ax_humidity.set_xlim([min(wurst2['time'])-axis_offset, max(wurst2['time'])+axis_offset])
-#ax_humidity.xaxis.set_tick_params(rotation=90)
-
-#ax_logger_temperature.plot(weather_data['datetime'], weather_data['Temperature_20339014_°C'], '.', color=temp_colour)
-ax_logger_temperature.plot(all_data['time'], all_data['logger_temp'], '.', color=temp_colour, markersize=ms)
-ax_logger_temperature.set_xlabel('date')
-ax_logger_temperature.set_ylabel('temperature, $^{\circ}\,C$')
-ax_logger_temperature.set_ylim([-30,30])
-ax_logger_temperature.set_xlim([min_time, max_time])
-ax_logger_temperature.set_title('datalogger temperature')
-ax_logger_temperature.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
-ax_logger_temperature.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-ax_logger_temperature.set_xlim([min(wurst2['time'])-axis_offset, max(wurst2['time'])+axis_offset])
-ax_logger_temperature.xaxis.set_tick_params(rotation=90)
-
-ax_air_temperature.plot(weather_data['datetime'], weather_data['Temperature_20339014_°C'], '.', color=humidity_colour, markersize=ms)
-ax_air_temperature.set_xlabel('date')
-ax_air_temperature.set_ylabel('temperature, $^{\circ}\,C$')
-ax_air_temperature.set_ylim([-30,30])
-ax_air_temperature.set_xlim([min_time, max_time])
-ax_air_temperature.set_title('air temperature, Kaskawulsh')
-ax_air_temperature.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
-ax_air_temperature.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-ax_air_temperature.set_xlim([min(wurst2['time'])-axis_offset, max(wurst2['time'])+axis_offset])
-ax_air_temperature.xaxis.set_tick_params(rotation=90)
-plt.tight_layout()
-plt.savefig(output_path + 'wurst_pressure.png')
-plt.savefig(output_path + 'wurst_pressure.svg', format='svg', dpi=1200)
 #endregion
 
-#region plot voltage on all instruments
-fig_wurst_voltage, ax = plt.subplots(figsize=(10,5)) 
-ax.plot(wurst2['time'], wurst2['wurst_voltage'], '.', label='CF240002', color=wurst2_colour)
-ax.plot(wurst4['time'], wurst4['wurst_voltage'], '.', label='CF240004', color=wurst4_colour)
-ax.plot(wurst7['time'], wurst7['wurst_voltage'], '.', label='CF240007', color=wurst7_colour)
-ax.plot(wurst8['time'], wurst8['wurst_voltage'], '.', label='CF240008', color=wurst8_colour)
-ax.legend()
-ax.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
-#ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M'))
-ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-ax.xaxis.set_tick_params(rotation=90)
-plt.title('instrument battery voltage')
-plt.xlabel('date')
-plt.ylabel('voltage, mA')
-plt.tight_layout()
-plt.savefig(output_path + 'wurst_voltage.png')
-plt.savefig(output_path + 'wurst_voltage.svg', format='svg', dpi=1200)
+#region load data
+def figure_columns (figure_names, key='columns'):
+    # the processed data columns (key='columns') or weather columns (key='weather_columns') used by the figures
+    columns = []
+    for name in figure_names:
+        columns += [column for column in figures[name][key] if column not in columns]
+    return columns
+
+def figure_weather_columns (figure_names, pressure_correction='logger'):
+    # weather columns used by the figures, plus station pressure if wurst pressure is corrected with it
+    weather_columns = figure_columns(figure_names, 'weather_columns')
+    if (pressure_correction == 'station' and 'pressure' in figure_columns(figure_names)
+            and station_pressure_column not in weather_columns):
+        weather_columns.append(station_pressure_column)
+    return weather_columns
+
+def load_processed_data (columns, start_date=None):
+    # times are already stored as datetimes. if there is no processed data store yet, fall back to the .csv export
+    # start_date = first day to load, as a 'YYYY-MM-DD' string (store only)
+    if os.path.exists(store_directory):
+        return read_processed_store(store_directory, columns=columns, start_date=start_date)
+    return read_processed_csv(satellite_file, columns=columns)
+
+def load_figure_weather_data (weather_columns):
+    # weather data from Kaskawulsh weather station:
+    # download latest .txt file from this address, and save in raw data directory
+    # https://datagarrison.com/users/300034012631040/300234068884730/
+    # station times are converted to UTC, to match the wurst data. Parsed files are cached in data/processed/weather/
+    weather_list = glob.glob(working_directory+'/data/raw/300234068884730*.txt')
+    return load_weather_data(weather_list, columns=weather_columns, cache_directory=weather_cache_directory)
+
+def prepare_plot_data (all_data, weather_data=None, instruments=None, pressure_correction='logger', weather_columns=None):
+    # derives everything the figures draw from the processed data. all_data itself is not changed,
+    # so it can be kept and extended with new packets (see cryowurst_watch.py)
+    # instruments = instrument registry (loaded from wurst_colours.toml if None)
+    # pressure_correction = 'logger' or 'station', see pressure_correction_sources
+    # weather_columns = weather columns to join onto every wurst sample (none if None). station pressure is
+    # joined too when pressure_correction is 'station'
+    #correct for local pressure, measured by receiver
+    if pressure_correction == 'logger' and 'pressure' in all_data and 'logger_pressure' in all_data:
+        all_data = all_data.assign(pressure=all_data['pressure']-(all_data['logger_pressure']/1e9))
+
+    # add per-wurst fields (depth, change in tilt relative to starting value) from the instrument registry
+    # in wurst_colours.toml, and split the data by wurst in a single pass
+    if instruments is None:
+        instruments = load_instrument_registry()
+    wurst_data = add_instrument_fields(all_data, instruments)
+
+    # add the nearest weather record to every wurst sample, for the weather columns that are used
+    weather_columns = list(weather_columns or [])
+    if pressure_correction == 'station' and 'pressure' in wurst_data and station_pressure_column not in weather_columns:
+        weather_columns.append(station_pressure_column)
+    if weather_data is not None and len(weather_columns) > 0:
+        wurst_data, n_unmatched = attach_weather(wurst_data, weather_data, weather_columns)
+        if n_unmatched > 0:
+            print('Warning: '+str(n_unmatched)+' of '+str(len(wurst_data))+' wurst sample(s) have no weather record within '+
+                  str(int(weather_tolerance.total_seconds()/60))+' minutes - their '+', '.join(weather_columns)+' values are NaN.')
+    #correct for local pressure, measured by weather station (mbar to bar)
+    if pressure_correction == 'station' and 'pressure' in wurst_data:
+        if station_pressure_column not in wurst_data:
+            raise ValueError('station pressure correction needs the '+station_pressure_column+' weather column')
+        wurst_data['pressure'] = wurst_data['pressure'] - wurst_data[station_pressure_column]/1000
+    wurste = dict(tuple(wurst_data.groupby('UID', sort=False)))
+
+    return {'all_data': all_data, 'wurst_data': wurst_data, 'wurste': wurste, 'instruments': instruments,
+            'weather_data': weather_data}
+
+def load_plot_data (figure_names, pressure_correction='logger'):
+    # loads everything needed to draw the selected figures, once, for all of them
+    # only the processed data columns (and weather data) used by the selected figures are loaded
+    with stage('load_processed') as record:
+        all_data = load_processed_data(figure_columns(figure_names))
+        record['rows'] = len(all_data)
+    weather_columns = figure_weather_columns(figure_names, pressure_correction)
+    weather_data = None
+    if len(weather_columns) > 0:
+        with stage('load_weather') as record:
+            weather_data = load_figure_weather_data(weather_columns)
+            record['rows'] = len(weather_data)
+    with stage('prepare') as record:
+        plot_data = prepare_plot_data(all_data, weather_data, pressure_correction=pressure_correction)
+        record['rows'] = len(plot_data['wurst_data'])
+    return plot_data
 #endregion
 
-#min_time = datetime.datetime(2024, 11, 7, 0, 0, 0)
-#max_time = datetime.datetime(2024, 11, 26, 12, 0, 0)
-#region plot voltage on datalogger/receiver
-fig_logger_voltage, ax = plt.subplots(figsize=(10,5))
-ax.plot(all_data['time'], all_data['logger_voltage']*0.0041-0.3086, '.', color='#4B4E6D')
-ax.plot(all_data['time'], all_data['logger_voltage']*0.0041-0.3086, color='#4B4E6D')
-#ax.set_ylim([10, 16])
-#ax.set_xlim([min_time, max_time])
-ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-ax.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
-ax.xaxis.set_tick_params(rotation=90)
-plt.title('receiver battery voltage')
-plt.xlabel('date')
-plt.ylabel('logger voltage, V')
-plt.tight_layout()
-plt.savefig(output_path + 'logger_voltage.png')
-plt.savefig(output_path+'logger_voltage.svg', format='svg', dpi=1200)
-#region
-
-#region plot temperature values 
-fig_temp_curves, ax_temp_curves = plt.subplots(figsize=(11,5))
-ax_temp_curves.plot(wurst8['time'], wurst8['tmp_temp'], '.', color=wurst8_colour, label='cf240008, 37m')
-ax_temp_curves.plot(wurst7['time'], wurst7['tmp_temp'], '.', color=wurst7_colour, label='cf240007, 87m')
-ax_temp_curves.plot(wurst2['time'], wurst2['tmp_temp'], '.', color=wurst2_colour, label='cf240002, 138m')
-ax_temp_curves.plot(wurst4['time'], wurst4['tmp_temp'], '.', color=wurst4_colour, label='cf240004, 158m')
-ax_temp_curves.set_xlabel('hours since deployment')
-ax_temp_curves.set_ylabel('temperature, $^{\circ}$C')
-ax_temp_curves.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
-ax_temp_curves.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-ax_temp_curves.xaxis.set_tick_params(rotation=90)
-ax_temp_curves.set_ylim([-0.2, 0.1])
-ax_temp_curves.legend()
-plt.title('wurst temperature')
-plt.tight_layout()
-fig_temp_curves.savefig(output_path+'temp_curves_together.svg', format='svg', dpi=1200)
-fig_temp_curves.savefig(output_path+'temp_curves_together.png')
+#region figures
+# each figure function draws one figure from plot_data and returns it, without saving it
+# (or returns None if there is nothing to draw, and the figure is skipped)
+
+def decimated (ax, data, x_column, y_column, x_range=None):
+    # rows of data to draw on ax, reduced to about two points per pixel column of the axes
+    # x_range = (first, last) visible x values, if the x limits will be set explicitly
+    n_pixels = max(int(ax.get_window_extent().width), 1)
+    return decimate(data, x_column, y_column, n_pixels, method=render_settings['decimate'], x_range=x_range)
+
+def plot_wurst_pressure (plot_data):
+    # wurst pressure plus data from weather station
+    all_data = plot_data['all_data']
+    wurst_data = plot_data['wurst_data']
+    wurste = plot_data['wurste']
+    weather_data = plot_data['weather_data']
+    basal_instruments = plot_data['instruments'][plot_data['instruments']['basal']]
+    if not any(uid in wurste for uid in basal_instruments.index):
+        print('Skipped wurst_pressure: none of the basal wurste in the instrument registry are in the loaded data.')
+        return None
+    time_range = (min(wurst_data['time'])-axis_offset, max(wurst_data['time'])+axis_offset)
+
+    #fig_pressure, (ax_pressure, ax_temperature, ax_humidity) = plt.subplots(3,1, figsize=(12,12), sharex=True)
+    fig_pressure = Figure(figsize=(12,12))
+    ax_pressure, ax_logger_temperature, ax_air_temperature = fig_pressure.subplots(3,1, sharex=True)
+    for uid, instrument in basal_instruments.iterrows():
+        if uid in wurste:
+            wurst = decimated(ax_pressure, wurste[uid], 'time', 'pressure', x_range=time_range)
+            ax_pressure.plot(wurst['time'], wurst['pressure'], '.', label=instrument['label'], color=instrument['colour'], markersize=ms)
+    #ax_pressure.set_xlabel('date')
+    ax_pressure.set_ylabel('pressure, bar')
+    ax_pressure.set_title('wurst pressure')
+    ax_pressure.legend(loc='lower right')
+    ax_pressure.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
+    ax_pressure.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax_pressure.set_xlim([min(wurst_data['time'])-axis_offset, max(wurst_data['time'])+axis_offset])
+    ax_pressure.set_xlim([min_time, max_time])
+    ax_pressure.set_ylim([2, 17])
+    ax_pressure.xaxis.set_tick_params(rotation=90)
+
+    #ax_humidity.plot(weather_data['datetime'], weather_data['RH_20339014_%'], '.', color=temp_colour)
+    ##ax_humidity.set_xlabel('date')
+    #ax_humidity.set_ylabel('humidity, $^{\circ}\,C$')
+    ##ax_humidity.set_ylim([-25,25])
+    #ax_humidity.set_xlim([min_time, max_time])
+    #ax_humidity.set_title('relative humidity, %')
+    #ax_humidity.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
+    #ax_humidity.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    #ax_humidity.set_xlim([min(wurst_data['time'])-axis_offset, max(wurst_data['time'])+axis_offset])
+    #ax_humidity.xaxis.set_tick_params(rotation=90)
+
+    #ax_logger_temperature.plot(weather_data['datetime'], weather_data['Temperature_20339014_°C'], '.', color=temp_colour)
+    logger = decimated(ax_logger_temperature, all_data, 'time', 'logger_temp', x_range=time_range)
+    ax_logger_temperature.plot(logger['time'], logger['logger_temp'], '.', color=temp_colour, markersize=ms)
+    ax_logger_temperature.set_xlabel('date')
+    ax_logger_temperature.set_ylabel('temperature, $^{\circ}\,C$')
+    ax_logger_temperature.set_ylim([-30,30])
+    ax_logger_temperature.set_xlim([min_time, max_time])
+    ax_logger_temperature.set_title('datalogger temperature')
+    ax_logger_temperature.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
+    ax_logger_temperature.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax_logger_temperature.set_xlim([min(wurst_data['time'])-axis_offset, max(wurst_data['time'])+axis_offset])
+    ax_logger_temperature.xaxis.set_tick_params(rotation=90)
+
+    weather = decimated(ax_air_temperature, weather_data, 'datetime', 'Temperature_20339014_°C', x_range=time_range)
+    ax_air_temperature.plot(weather['datetime'], weather['Temperature_20339014_°C'], '.', color=humidity_colour, markersize=ms)
+    ax_air_temperature.set_xlabel('date')
+    ax_air_temperature.set_ylabel('temperature, $^{\circ}\,C$')
+    ax_air_temperature.set_ylim([-30,30])
+    ax_air_temperature.set_xlim([min_time, max_time])
+    ax_air_temperature.set_title('air temperature, Kaskawulsh')
+    ax_air_temperature.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
+    ax_air_temperature.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax_air_temperature.set_xlim([min(wurst_data['time'])-axis_offset, max(wurst_data['time'])+axis_offset])
+    ax_air_temperature.xaxis.set_tick_params(rotation=90)
+    fig_pressure.tight_layout()
+    return fig_pressure
+
+def plot_wurst_voltage (plot_data):
+    # voltage on all instruments
+    wurste = plot_data['wurste']
+    fig_wurst_voltage = Figure(figsize=(10,5))
+    ax = fig_wurst_voltage.subplots()
+    for uid, instrument in plot_data['instruments'].iterrows():
+        if uid in wurste:
+            wurst = decimated(ax, wurste[uid], 'time', 'wurst_voltage')
+            ax.plot(wurst['time'], wurst['wurst_voltage'], '.', label=uid.upper(), color=instrument['colour'])
+    ax.legend()
+    ax.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
+    #ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m %H:%M'))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax.xaxis.set_tick_params(rotation=90)
+    ax.set_title('instrument battery voltage')
+    ax.set_xlabel('date')
+    ax.set_ylabel('voltage, mA')
+    fig_wurst_voltage.tight_layout()
+    return fig_wurst_voltage
+
+def plot_logger_voltage (plot_data):
+    # voltage on datalogger/receiver
+    all_data = plot_data['all_data']
+    #min_time = datetime.datetime(2024, 11, 7, 0, 0, 0)
+    #max_time = datetime.datetime(2024, 11, 26, 12, 0, 0)
+    fig_logger_voltage = Figure(figsize=(10,5))
+    ax = fig_logger_voltage.subplots()
+    logger = decimated(ax, all_data, 'time', 'logger_voltage')
+    ax.plot(logger['time'], logger['logger_voltage']*0.0041-0.3086, '.', color='#4B4E6D')
+    ax.plot(logger['time'], logger['logger_voltage']*0.0041-0.3086, color='#4B4E6D')
+    #ax.set_ylim([10, 16])
+    #ax.set_xlim([min_time, max_time])
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
+    ax.xaxis.set_tick_params(rotation=90)
+    ax.set_title('receiver battery voltage')
+    ax.set_xlabel('date')
+    ax.set_ylabel('logger voltage, V')
+    fig_logger_voltage.tight_layout()
+    return fig_logger_voltage
+
+def plot_temp_curves_together (plot_data):
+    # temperature values of all wurste over time
+    wurste = plot_data['wurste']
+    fig_temp_curves = Figure(figsize=(11,5))
+    ax_temp_curves = fig_temp_curves.subplots()
+    for uid, instrument in plot_data['instruments'].iterrows():
+        if uid in wurste:
+            wurst = decimated(ax_temp_curves, wurste[uid], 'time', 'tmp_temp')
+            ax_temp_curves.plot(wurst['time'], wurst['tmp_temp'], '.', color=instrument['colour'], label=instrument['label'])
+    ax_temp_curves.set_xlabel('hours since deployment')
+    ax_temp_curves.set_ylabel('temperature, $^{\circ}$C')
+    ax_temp_curves.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
+    ax_temp_curves.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+    ax_temp_curves.xaxis.set_tick_params(rotation=90)
+    ax_temp_curves.set_ylim([-0.2, 0.1])
+    ax_temp_curves.legend()
+    ax_temp_curves.set_title('wurst temperature')
+    fig_temp_curves.tight_layout()
+    return fig_temp_curves
+
+def plot_temp_depth (plot_data):
+    # temperature as color over depth and time
+    # cmocean is only needed for this figure, so it is imported here
+    import cmocean
+    wurste = plot_data['wurste']
+    if len(wurste) == 0:
+        print('Skipped temp_depth: none of the wurste in the instrument registry are in the loaded data.')
+        return None
+    cmap=cmocean.cm.thermal
+    vmin = -0.2
+    vmax = 0.0
+    fig_temp_depth = Figure()
+    ax_temp = fig_temp_depth.subplots()
+    # each wurst is decimated on its temperature (the colour), so the warmest and coldest readings are kept
+    wurst_data = pd.concat([decimated(ax_temp, wurst, 'time', 'tmp_temp') for wurst in wurste.values()])
+    mappable = ax_temp.scatter(wurst_data['time'], wurst_data['depth'], 10, wurst_data['tmp_temp'], cmap=cmap, vmin=vmin, vmax=vmax)
+    ax_temp.invert_yaxis()
+    ax_temp.set_title('temperature, degrees')
+    ax_temp.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
+    ax_temp.xaxis.set_major_formatter(mdates.DateFormatter('%d %b'))
+    ax_temp.xaxis.set_tick_params(rotation=90)
+    fig_temp_depth.colorbar(mappable)
+    ax_temp.set_xlabel('date')
+    ax_temp.set_ylabel('depth, m')
+    fig_temp_depth.tight_layout()
+    return fig_temp_depth
+
+# every figure, with the function that draws it, the processed data and weather columns it needs,
+# and the formats it is saved in
+figures = {
+    'wurst_pressure': {'plot': plot_wurst_pressure,
+                       'columns': ['pressure', 'logger_pressure', 'logger_temp'],
+                       'weather_columns': ['Temperature_20339014_°C'],
+                       'formats': ['png', 'svg']},
+    'wurst_voltage': {'plot': plot_wurst_voltage, 'columns': ['wurst_voltage'], 'weather_columns': [],
+                      'formats': ['png', 'svg']},
+    'logger_voltage': {'plot': plot_logger_voltage, 'columns': ['logger_voltage'], 'weather_columns': [],
+                       'formats': ['png', 'svg']},
+    'temp_curves_together': {'plot': plot_temp_curves_together, 'columns': ['tmp_temp'], 'weather_columns': [],
+                             'formats': ['png', 'svg']},
+    'temp_depth': {'plot': plot_temp_depth, 'columns': ['tmp_temp'], 'weather_columns': [],
+                   'formats': ['png', 'svg']},
+}
+
+vector_formats = ['svg', 'pdf']
 #endregion
 
-#region plot temperature as color over depth and time
-cmap=cmocean.cm.thermal
-vmin = -0.2 
-vmax = 0.0
-fig_change_in_tilt, ax_temp = plt.subplots()
-mappable = ax_temp.scatter(wurst2['time'], wurst2['depth'], 10, wurst2['tmp_temp'], cmap=cmap, vmin=vmin, vmax=vmax)
-ax_temp.scatter(wurst4['time'], wurst4['depth'], 10, wurst4['tmp_temp'], cmap=cmap, vmin=vmin, vmax=vmax)
-ax_temp.scatter(wurst7['time'], wurst7['depth'], 10, wurst7['tmp_temp'], cmap=cmap, vmin=vmin, vmax=vmax)
-ax_temp.scatter(wurst8['time'], wurst8['depth'], 10, wurst8['tmp_temp'], cmap=cmap, vmin=vmin, vmax=vmax)
-ax_temp.invert_yaxis()
-ax_temp.set_title('temperature, degrees')
-ax_temp.xaxis.set_major_locator(mdates.HourLocator(interval=hour_locator))
-ax_temp.xaxis.set_major_formatter(mdates.DateFormatter('%d %b'))
-ax_temp.xaxis.set_tick_params(rotation=90)
-plt.colorbar(mappable)
-ax_temp.set_xlabel('date')
-ax_temp.set_ylabel('depth, m')
-plt.tight_layout()
-plt.savefig(output_path + 'temp_depth.png')
-plt.savefig(output_path + 'temp_depth.svg', format='svg', dpi=1200)
+#region rendering
+# data shared (read-only) by all figures rendered in a worker process, set once when the worker starts
+shared_plot_data = None
+
+# output settings for all figures, set from the command line: formats (None = each figure's own list),
+# whether to rasterize dense layers in vector output
+# and the decimation method for long time series (None = plot every point)
+render_settings = {'formats': None, 'rasterize': True, 'decimate': 'minmax'}
+
+def set_shared_plot_data (plot_data, settings):
+    global shared_plot_data, render_settings
+    shared_plot_data = plot_data
+    render_settings = settings
+
+def rasterize_dense_artists (fig):
+    # marks the lines and scatter layers of axes with many points to be drawn as images in vector output
+    # (otherwise every marker is a separate path element). Axes, ticks, legends and text are not affected
+    for ax in fig.axes:
+        artists = list(ax.get_lines()) + list(ax.collections)
+        n_points = sum(len(line.get_xdata()) for line in ax.get_lines())
+        n_points += sum(len(collection.get_offsets()) for collection in ax.collections)
+        if n_points > rasterize_min_points:
+            for artist in artists:
+                artist.set_rasterized(True)
+
+def save_figure (fig, name, formats):
+    # saves a figure in each of the given formats
+    for file_format in formats:
+        if file_format in vector_formats:
+            fig.savefig(output_path + name + '.' + file_format, format=file_format, dpi=vector_raster_dpi)
+        else:
+            fig.savefig(output_path + name + '.' + file_format, format=file_format)
+
+def render_figure (name, plot_data=None, settings=None):
+    # draws and saves a single figure. figures aren't kept by pyplot, so its memory is freed once it is saved
+    # returns the stage records of drawing and saving it (this may run in a worker process)
+    if plot_data is None:
+        plot_data = shared_plot_data
+    if settings is None:
+        settings = render_settings
+    formats = settings['formats'] or figures[name]['formats']
+    records = []
+    with stage('draw:'+name, records) as record:
+        fig = figures[name]['plot'](plot_data)
+        record['rows'] = 0 if fig is None else 1
+    if fig is None:
+        return records
+    with stage('save:'+name, records) as record:
+        if settings['rasterize'] and any(file_format in vector_formats for file_format in formats):
+            rasterize_dense_artists(fig)
+        save_figure(fig, name, formats)
+        record['rows'] = len(formats)
+    return records
+
+def render_figures (figure_names, plot_data, jobs=None):
+    # renders the figures in a process pool, so the total time is that of the slowest figure
+    # with a single figure or a single job, figures are rendered in this process instead
+    if jobs is None:
+        jobs = min(len(figure_names), os.cpu_count() or 1)
+    if jobs <= 1 or len(figure_names) <= 1:
+        results = [render_figure(name, plot_data) for name in figure_names]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs, initializer=set_shared_plot_data,
+                                                    initargs=(plot_data, render_settings)) as pool:
+            results = list(pool.map(render_figure, figure_names))
+    for records in results:
+        add_stage_records(records)
+    return figure_names
 #endregion
+
+if __name__ == '__main__':
+    # same as python cryowurst.py plot. this module is passed in, so it isn't imported a second time
+    from cryowurst import make_parser, run_plot
+    args = make_parser('plot', sys.modules[__name__]).parse_args(['plot'] + sys.argv[1:])
+    run_plot(args, args.command_parser, sys.modules[__name__])
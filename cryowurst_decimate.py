@@ -0,0 +1,87 @@
+# downsampling of long time series before plotting.
+# drawing every sample is slow and looks no better than a few thousand well-chosen points, so series are
+# reduced to roughly the number of pixels they are drawn across:
+# minmax = keeps the smallest and largest value in each pixel column, so spikes and outliers are never lost
+# lttb = largest-triangle-three-buckets, keeps the points that best preserve the visual shape of the curve
+# both return the positions of the points to keep, in order, so they can be used on whole dataframes
+
+import numpy as np
+
+
+decimation_methods = ['minmax', 'lttb']
+
+def numeric_x (x):
+    # x values as float64, with datetimes as nanoseconds
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+def minmax_indices (x, y, n_bins):
+    # positions of the smallest and largest y in each of n_bins equal-width bins of x. NaN values are dropped
+    x = numeric_x(x)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.flatnonzero(~np.isnan(y))
+    if len(keep) <= 2*n_bins:
+        return keep
+    x_first, x_last = x[keep].min(), x[keep].max()
+    if x_last <= x_first:
+        return keep
+
+    bins = ((x[keep] - x_first) / (x_last - x_first) * n_bins).astype(np.int64).clip(0, n_bins - 1)
+    # sort by bin, then by value: the first point of each bin is its minimum and the last is its maximum
+    order = np.lexsort((y[keep], bins))
+    sorted_bins = bins[order]
+    starts = np.flatnonzero(np.r_[True, sorted_bins[1:] != sorted_bins[:-1]])
+    ends = np.r_[starts[1:], len(order)] - 1
+    return keep[np.unique(np.r_[order[starts], order[ends]])]
+
+def lttb_indices (x, y, n_out):
+    # positions of n_out points chosen by largest-triangle-three-buckets (Steinarsson, 2013)
+    # the first and last points are always kept. NaN values are dropped
+    x = numeric_x(x)
+    y = np.asarray(y, dtype=np.float64)
+    keep = np.flatnonzero(~np.isnan(y))
+    n = len(keep)
+    if n_out >= n or n_out < 3:
+        return keep
+    x = x[keep]
+    y = y[keep]
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_end = n - 1, n
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean()
+        # twice the area of the triangle between the last selected point, each candidate and the next bucket average
+        area = np.abs((x[a] - average_x)*(y[start:end] - y[a]) - (x[a] - x[start:end])*(average_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[bucket + 1] = a
+    return keep[selected]
+
+def decimate (data, x_column, y_column, n_pixels, method='minmax', x_range=None):
+    # returns the rows of a dataframe to draw across n_pixels pixel columns
+    # y_column = the values whose shape should be kept (e.g. the colour values of a scatter plot)
+    # method = 'minmax', 'lttb' or None (no decimation)
+    # x_range = (first, last) x values that will be visible. points outside are dropped before decimating
+    if method is None:
+        return data
+    if x_range is not None:
+        data = data[(data[x_column] >= x_range[0]) & (data[x_column] <= x_range[1])]
+    if len(data) <= 2*n_pixels:
+        return data
+    if method == 'minmax':
+        positions = minmax_indices(data[x_column].values, data[y_column].values, n_pixels)
+    elif method == 'lttb':
+        positions = lttb_indices(data[x_column].values, data[y_column].values, 2*n_pixels)
+    else:
+        raise ValueError('unknown decimation method '+str(method)+', use one of '+', '.join(decimation_methods))
+    return data.iloc[positions]
@@ -0,0 +1,51 @@
+# instrument registry: UID, depth and plotting colours of each wurst, from wurst_colours.toml
+# to add a wurst, add a table to wurst_colours.toml - no changes to the plotting code are needed
+
+import os
+import toml
+import pandas as pd
+
+
+registry_file_name = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wurst_colours.toml')
+
+def toml_colour (colour):
+    # converts a {r=, g=, b=} table to an (r, g, b) tuple
+    return (colour['r'], colour['g'], colour['b'])
+
+def load_instrument_registry (file_name=registry_file_name):
+    # returns a dataframe indexed by UID, with one row per wurst, in order of depth
+    # columns: name, depth, basal, colour (c1), colour_light (c2), colour_dark (c3), label
+    registry = toml.load(file_name)
+    rows = []
+    for name, instrument in registry.items():
+        if not isinstance(instrument, dict) or 'uid' not in instrument:
+            continue
+        rows.append({
+            'UID': instrument['uid'],
+            'name': name,
+            'depth': float(instrument['depth']),
+            'basal': bool(instrument.get('basal', False)),
+            'colour': toml_colour(instrument['c1']),
+            'colour_light': toml_colour(instrument['c2']),
+            'colour_dark': toml_colour(instrument['c3']),
+            'label': instrument['uid'].upper()+', '+'{0:.0f}'.format(float(instrument['depth']))+'m',
+        })
+    return pd.DataFrame(rows).set_index('UID').sort_values(by='depth')
+
+def load_colours (file_name=registry_file_name):
+    # returns the other plotting colours in the [colours] table of the registry, as a dict of name -> (r, g, b)
+    return {name: toml_colour(colour) for name, colour in toml.load(file_name)['colours'].items()}
+
+def add_instrument_fields (all_data, instruments):
+    # adds per-wurst derived fields to the processed data in one pass over the table:
+    # depth = installation depth of the wurst
+    # change_in_pitch, change_in_roll = change in tilt relative to the first reading of each wurst
+    # rows from wurste that aren't in the registry are dropped. all_data should be in order of time
+    wurst_data = all_data[all_data['UID'].isin(instruments.index)].copy()
+    wurst_data['depth'] = wurst_data['UID'].map(instruments['depth'])
+    by_uid = wurst_data.groupby('UID', sort=False)
+    if 'tilt_pitch' in wurst_data:
+        wurst_data['change_in_pitch'] = wurst_data['tilt_pitch'] - by_uid['tilt_pitch'].transform('first')
+    if 'tilt_roll' in wurst_data:
+        wurst_data['change_in_roll'] = wurst_data['tilt_roll'] - by_uid['tilt_roll'].transform('first')
+    return wurst_data
@@ -0,0 +1,57 @@
+# record of the raw data already ingested into the processed data store (data/processed/ingest_manifest.json):
+# files = size, modification time and content hash of every ingested cloudloop file, by file name
+# last_time = time of the last decoded packet for each UID, in unix seconds (the ingest watermark,
+# used to find the packets an ingest run added. packets older than it are still ingested)
+# only uses the standard library, so the state of the data can be checked without loading pandas
+
+import glob
+import hashlib
+import json
+import os
+
+
+# where the raw data, processed data and manifest are kept
+working_directory = os.path.dirname(os.path.abspath(__file__))
+raw_data_directory = working_directory+'/data/raw/'
+processed_data_directory = working_directory+'/data/processed/'
+manifest_file_name = processed_data_directory+'ingest_manifest.json'
+
+def file_fingerprint (file_name):
+    # size, modification time and sha256 content hash of a raw data file
+    sha256 = hashlib.sha256()
+    with open(file_name, 'rb') as raw_file:
+        for block in iter(lambda: raw_file.read(1 << 20), b''):
+            sha256.update(block)
+    file_stat = os.stat(file_name)
+    return {'size': file_stat.st_size, 'mtime': file_stat.st_mtime, 'sha256': sha256.hexdigest()}
+
+def file_is_unchanged (file_name, manifest_entry):
+    # checks a raw data file against its manifest entry
+    # size and mtime are checked first, so unchanged files are only hashed if they have been touched
+    if manifest_entry is None:
+        return False
+    file_stat = os.stat(file_name)
+    if file_stat.st_size != manifest_entry['size']:
+        return False
+    if file_stat.st_mtime == manifest_entry['mtime']:
+        return True
+    return file_fingerprint(file_name)['sha256'] == manifest_entry['sha256']
+
+def load_manifest (manifest_file_name):
+    # loads the record of already ingested files and the last decoded packet time (unix seconds) per UID
+    if not os.path.exists(manifest_file_name):
+        return {'files': {}, 'last_time': {}}
+    with open(manifest_file_name) as manifest_file:
+        return json.load(manifest_file)
+
+def save_manifest (manifest, manifest_file_name):
+    # writes to a temporary file first, so an interrupted run can't leave a half-written manifest
+    with open(manifest_file_name+'.tmp', 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    os.replace(manifest_file_name+'.tmp', manifest_file_name)
+
+def changed_raw_files (raw_data_directory, manifest):
+    # cloudloop files in raw_data_directory that are new or have changed since they were ingested, in order of name
+    # this just looks for all .csv files with 'cloudloop' in the name
+    file_list = sorted(glob.glob(os.path.join(raw_data_directory, '*cloudloop*.csv')))
+    return [file for file in file_list if not file_is_unchanged(file, manifest['files'].get(os.path.basename(file)))]
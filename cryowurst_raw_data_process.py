@@ -1,11 +1,19 @@
-# converts raw data received from satellite to a .csv of processed values.
-# INPUT: log_file_name = location of hex data file as received from satellite. Single file (multiple files will need to be concatenated)
-# OUTPUT: output_file_name = location to save processed data as .csv file.
-
-# OUTPUT FILE FORMAT
-# Single line header
-# as comma separated columns:
-# time = date and time of measurement in datetime format
+# converts raw data received from satellite to processed values.
+# INPUT: all cloudloop .csv files of hex data as received from satellite, in data/raw/
+# OUTPUT: processed data store in data/processed/satellite_data/ (parquet, partitioned by UID and day,
+# see cryowurst_store.py). Run with --csv to also export everything to data/processed/satellite_data_processed.csv
+# by default only new or changed cloudloop files are decoded, and their packets are merged into the store, skipping
+# packets that are already there. Files can arrive in any order: a late or backfilled export is merged in the same way.
+# ingested files are recorded in data/processed/ingest_manifest.json. Run with --full to reprocess everything.
+# each file is read and decoded in chunks of --chunk-lines lines, so memory use depends on the chunk size rather than
+# the size of the archive. Files are decoded in parallel (--jobs worker processes), into a spool of decoded packets
+# split by wurst and day. The spool is then merged into the store one partition (wurst and day) at a time.
+# packets are sorted by their 2-byte header (see packet_types). W2 (wurst) packets go to the store above, and
+# C1 packets (ce... UIDs) to data/processed/c1_data/, with the logger fields decoded and the instrument data as hex.
+
+# OUTPUT COLUMNS
+# (the .csv export has a single line header, with these as comma separated columns)
+# time = date and time of measurement in datetime format (UTC)
 # UID = unique ID of cryowurst (CF + last two digits of year + instrument number)
 # tmp_temp = temperature measured by TMP117 sensor in degrees C
 # keller_temp = temperature measured by keller sensor in degrees C
@@ -17,12 +25,19 @@
 # logger_voltage = voltage supplied to data logger at the surface, V
 
 
-import datetime
+import concurrent.futures
+import itertools
 import pandas as pd
 import numpy as np
 import os
-import glob
-import struct
+import shutil
+import sys
+import tempfile
+from cryowurst_store import (processed_columns, clear_processed_store, read_processed_store, read_partition,
+                             write_partition, partition_dates)
+from cryowurst_manifest import (working_directory, raw_data_directory, processed_data_directory, manifest_file_name,
+                                file_fingerprint, load_manifest, save_manifest, changed_raw_files)
+from cryowurst_stages import stage, timed_chunks, add_stage_records
 
 
 #region functions
@@ -49,137 +64,360 @@ def convert_keller_temperature (raw_temperature):
 
     return celcius_temp
 
+# layout of a single 62-byte wurst packet, as numpy structured dtype
+# all values are little-endian. keller_temp and wurst_voltage overlap at byte 58
+wurst_packet_length = 62
+wurst_packet_dtype = np.dtype({
+    'names':   ['header', 'time', 'logger_temp', 'logger_pressure', 'logger_voltage', 'channel_number',
+                'uid', 'tmp_temp', 'mag_x', 'mag_y', 'mag_z', 'imu_x', 'imu_y', 'imu_z',
+                'tilt_x', 'tilt_y', 'tilt_z', 'tilt_pitch', 'tilt_roll', 'ec', 'pressure',
+                'keller_temp', 'wurst_voltage'],
+    'formats': ['S2', '<i4', '<f4', '<i4', '<i2', 'u1',
+                '<u4', '<i2', '<u2', '<u2', '<u2', '<i2', '<i2', '<i2',
+                '<i2', '<i2', '<i2', '<i2', '<i2', '<u2', '<u2',
+                '<i2', '<i2'],
+    'offsets': [0, 2, 6, 10, 14, 16,
+                21, 28, 30, 32, 34, 36, 38, 40,
+                42, 44, 46, 48, 50, 52, 54,
+                57, 58],
+    'itemsize': wurst_packet_length,
+})
+
+# layout of a single 41-byte C1 packet (ce... UIDs). The header fields are the same as in wurst packets,
+# followed by 16 bytes of instrument data whose layout isn't decoded yet - these are kept as a hex string
+c1_packet_length = 41
+c1_packet_dtype = np.dtype({
+    'names':   ['header', 'time', 'logger_temp', 'logger_pressure', 'logger_voltage', 'channel_number',
+                'uid', 'payload'],
+    'formats': ['S2', '<i4', '<f4', '<i4', '<i2', 'u1',
+                '<u4', 'V16'],
+    'offsets': [0, 2, 6, 10, 14, 16,
+                21, 25],
+    'itemsize': c1_packet_length,
+})
+
+# columns of the C1 output table, in order
+c1_columns = ['time', 'UID', 'payload', 'logger_voltage', 'logger_pressure', 'logger_temp', 'channel_number']
+
+def format_uids (raw_uids):
+    # formats raw UIDs as hex strings. UIDs are few, so only the unique ones are formatted
+    unique_uids, uid_index = np.unique(raw_uids, return_inverse=True)
+    uid_strings = np.array(['{0:x}'.format(uid) for uid in unique_uids], dtype=object)
+    return uid_strings[uid_index.reshape(-1)]
+
+def format_hex (raw_bytes):
+    # formats each row of an (n, m) uint8 array as a 2m-character hex string, without a python loop over rows
+    hex_digits = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
+    characters = np.empty((raw_bytes.shape[0], 2*raw_bytes.shape[1]), dtype=np.uint8)
+    characters[:, 0::2] = hex_digits[raw_bytes >> 4]
+    characters[:, 1::2] = hex_digits[raw_bytes & 0x0f]
+    return characters.view('S'+str(characters.shape[1])).reshape(-1).astype(str).astype(object)
+
+def decode_wurst_array (packets):
+    # converts an array of wurst packets (wurst_packet_dtype) to a dataframe of real values, in processed_columns order
+    processed_data = pd.DataFrame({
+        'time': pd.to_datetime(packets['time'].astype(np.int64), unit='s'),
+        'UID': format_uids(packets['uid']),
+        'tmp_temp': packets['tmp_temp']*0.0078125,
+        'keller_temp': convert_keller_temperature(packets['keller_temp'].astype(np.int64)),
+        'pressure': convert_keller_pressure(packets['pressure'].astype(np.int64)),
+        'mag_x': packets['mag_x'],
+        'mag_y': packets['mag_y'],
+        'mag_z': packets['mag_z'],
+        'imu_x': packets['imu_x']*(1000/16384),
+        'imu_y': packets['imu_y']*(1000/16384),
+        'imu_z': packets['imu_z']*(1000/16384),
+        'tilt_x': packets['tilt_x'],
+        'tilt_y': packets['tilt_y'],
+        'tilt_z': packets['tilt_z'],
+        'tilt_pitch': packets['tilt_pitch']*0.1,
+        'tilt_roll': packets['tilt_roll']*0.1,
+        'ec': packets['ec'],
+        'wurst_voltage': packets['wurst_voltage'],
+        'logger_voltage': packets['logger_voltage'],
+        'logger_pressure': packets['logger_pressure'],
+        'logger_temp': packets['logger_temp'].astype(np.float64),
+        'channel_number': packets['channel_number'],
+    }, columns=processed_columns)
+
+    return processed_data
+
+def decode_c1_array (packets):
+    # converts an array of C1 packets (c1_packet_dtype) to a dataframe, in c1_columns order
+    raw_payload = np.frombuffer(packets['payload'].tobytes(), dtype=np.uint8).reshape(len(packets), 16)
+    return pd.DataFrame({
+        'time': pd.to_datetime(packets['time'].astype(np.int64), unit='s'),
+        'UID': format_uids(packets['uid']),
+        'payload': format_hex(raw_payload),
+        'logger_voltage': packets['logger_voltage'],
+        'logger_pressure': packets['logger_pressure'],
+        'logger_temp': packets['logger_temp'].astype(np.float64),
+        'channel_number': packets['channel_number'],
+    }, columns=c1_columns)
+
+# packet types, keyed on the 2-byte header at the start of every packet
+# dtype = fixed-size packet layout, decode = function converting an array of packets to a dataframe,
+# table = name of the processed data store the packets are saved in (in data/processed/)
+packet_types = {
+    b'W2': {'dtype': wurst_packet_dtype, 'decode': decode_wurst_array, 'table': 'satellite_data'},
+    b'C1': {'dtype': c1_packet_dtype, 'decode': decode_c1_array, 'table': 'c1_data'},
+}
+
+def classify_lines (hex_lines):
+    # sorts satellite lines by packet type, in one vectorized pass over their 2-byte (4 hex digit) prefixes
+    # returns a dict of header -> series of hex lines. lines of unknown types are dropped
+    hex_lines = pd.Series(hex_lines, dtype=object)
+    prefixes = hex_lines.str[:4].str.lower()
+    header_of_prefix = {header.hex(): header for header in packet_types}
+    return {header_of_prefix[prefix]: lines for prefix, lines in hex_lines.groupby(prefixes, sort=False)
+            if prefix in header_of_prefix}
+
+def packet_buffer (hex_lines, packet_length):
+    # joins satellite lines of one packet type into one contiguous buffer of packets
+    # each satellite packet contains multiple instrument packets - any trailing partial packet is dropped
+    hex_length = 2*packet_length
+    line_lengths = hex_lines.str.len()
+    partial = line_lengths % hex_length != 0
+    if partial.any():
+        hex_lines = hex_lines.copy()
+        hex_lines[partial] = [line[:len(line) // hex_length * hex_length] for line in hex_lines[partial]]
+    return bytes.fromhex(''.join(hex_lines))
+
+def decode_packets (hex_lines):
+    # decodes all packets in a list of satellite hex strings, with one batched decode per packet type
+    # returns a dict of table name -> dataframe, for every packet type (empty dataframes for types not present)
+    lines_by_type = classify_lines(hex_lines)
+    tables = {}
+    for header, packet_type in packet_types.items():
+        buffer = b''
+        if header in lines_by_type:
+            buffer = packet_buffer(lines_by_type[header], packet_type['dtype'].itemsize)
+        packets = np.frombuffer(buffer, dtype=packet_type['dtype'])
+        tables[packet_type['table']] = packet_type['decode'](packets)
+    return tables
+
+# packets are identified by the instrument, the measurement time and the channel they were received on
+packet_key = ['UID', 'time', 'channel_number']
+
+def drop_duplicate_lines (hex_lines):
+    # removes repeated satellite lines - overlapping cloudloop exports contain the same lines more than once
+    # pd.unique is hash based and keeps the first occurrence of each line, in order
+    unique_lines = pd.unique(hex_lines)
+    return unique_lines, len(hex_lines) - len(unique_lines)
+
+def drop_duplicate_packets (processed_data, stored_data=None):
+    # removes repeated packets with the same packet_key, keeping the first one received
+    # packets already in stored_data (the store partition they are going to) are removed too
+    if stored_data is None or len(stored_data) == 0:
+        duplicated = processed_data.duplicated(subset=packet_key).to_numpy()
+    else:
+        keys = pd.concat([stored_data[packet_key], processed_data[packet_key]], ignore_index=True)
+        duplicated = keys.duplicated().to_numpy()[len(stored_data):]
+    return processed_data[~duplicated], int(duplicated.sum())
+
+def behind_watermark (processed_data, last_time):
+    # True if any packet is at or before the last decoded packet time for its UID (backfilled data)
+    if len(last_time) == 0 or len(processed_data) == 0:
+        return False
+    packet_time = processed_data['time'].values.astype('datetime64[s]').astype(np.int64)
+    watermark = processed_data['UID'].map(last_time).fillna(np.iinfo(np.int64).min).astype('int64')
+    return bool((packet_time <= watermark).any())
+
+def update_watermark (processed_data, last_time):
+    # moves the last decoded packet time for each UID forward to include newly decoded packets
+    if len(processed_data) == 0:
+        return last_time
+    newest = processed_data.groupby('UID')['time'].max()
+    newest_seconds = newest.values.astype('datetime64[s]').astype(np.int64)
+    for uid, time in zip(newest.index, newest_seconds):
+        last_time[uid] = max(int(time), last_time.get(uid, int(time)))
+    return last_time
+
+#endregion
+
+#region streaming decode
+def read_hex_chunks (file_name, chunk_lines):
+    # yields the satellite hex strings of a cloudloop export (the first column), chunk_lines lines at a time
+    # the file is read line by line, without pandas. blank lines are skipped
+    with open(file_name) as cloudloop_file:
+        lines = (line.split(',', 1)[0].strip() for line in cloudloop_file)
+        lines = (line for line in lines if line != '')
+        while True:
+            chunk = list(itertools.islice(lines, chunk_lines))
+            if len(chunk) == 0:
+                return
+            yield np.array(chunk, dtype=object)
+
+def decode_file_to_spool (file_name, spool_directory, chunk_lines):
+    # decodes one cloudloop export chunk by chunk. each chunk of decoded packets is split by output table, UID and
+    # day (the store partitions), and each part is written to its own parquet file in spool_directory
+    # (<table>/<UID>/<date>/<file>-<chunk number>.parquet), so only one chunk is held in memory at a time.
+    # returns a list of (table, UID, date, spool file name), the number of duplicate lines removed,
+    # and the stage records of reading, decoding and spooling (this may run in a worker process)
+    spool_chunks = []
+    n_duplicate_lines = 0
+    records = []
+    basename = os.path.splitext(os.path.basename(file_name))[0]
+    for chunk_number, hex_lines in enumerate(timed_chunks(read_hex_chunks(file_name, chunk_lines), 'read_hex', records)):
+        with stage('drop_duplicate_lines', records) as record:
+            hex_lines, n_duplicates = drop_duplicate_lines(hex_lines)
+            n_duplicate_lines += n_duplicates
+            record['rows'] = n_duplicates
+        with stage('decode_packets', records) as record:
+            tables = decode_packets(hex_lines)
+            record['rows'] = sum(len(processed_data) for processed_data in tables.values())
+        with stage('write_spool', records) as record:
+            record['rows'] = 0
+            for table, processed_data in tables.items():
+                if len(processed_data) == 0:
+                    continue
+                for (uid, date), partition_data in processed_data.groupby([processed_data['UID'],
+                                                                            partition_dates(processed_data)]):
+                    partition_spool = os.path.join(spool_directory, table, uid, date)
+                    os.makedirs(partition_spool, exist_ok=True)
+                    # numbered so that sorting the file names puts a file's chunks in the order they were read
+                    spool_file = os.path.join(partition_spool, basename+'-'+'{0:06d}'.format(chunk_number)+'.parquet')
+                    partition_data.to_parquet(spool_file, index=False)
+                    spool_chunks.append((table, uid, date, spool_file))
+                record['rows'] += len(processed_data)
+    return spool_chunks, n_duplicate_lines, records
+
+def decode_files_to_spool (file_list, spool_directory, chunk_lines, jobs):
+    # decodes cloudloop exports into spool_directory, in parallel across jobs worker processes
+    # returns all spooled chunks, and the number of duplicate lines removed
+    if jobs <= 1 or len(file_list) <= 1:
+        results = [decode_file_to_spool(file, spool_directory, chunk_lines) for file in file_list]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(decode_file_to_spool, file_list,
+                                    itertools.repeat(spool_directory), itertools.repeat(chunk_lines)))
+    for _, _, records in results:
+        add_stage_records(records)
+    spool_chunks = [spool_chunk for file_chunks, _, _ in results for spool_chunk in file_chunks]
+    return spool_chunks, sum(n_duplicates for _, n_duplicates, _ in results)
+
+def merge_spool_into_store (spool_chunks, processed_data_directory, last_time):
+    # merges spooled chunks into the store of their table one partition (UID and day) at a time: the partition's
+    # spooled chunks are read with the packets already stored in it, duplicate packets are dropped, and the partition
+    # is rewritten as a single file sorted by time. only one partition is held in memory at a time
+    # packets older than the watermark in last_time are kept: the store itself is what packets are checked against
+    # returns the number of new packets and duplicate packets per table, the updated watermark, and whether any
+    # new packet was at or before the watermark (backfilled data, e.g. an older export ingested after newer ones)
+    spool_files = {}
+    for table, uid, date, spool_file in sorted(spool_chunks):
+        spool_files.setdefault((table, uid, date), []).append(spool_file)
+
+    new_last_time = dict(last_time)
+    backfill = False
+    n_new_packets = {packet_type['table']: 0 for packet_type in packet_types.values()}
+    n_duplicate_packets = {packet_type['table']: 0 for packet_type in packet_types.values()}
+    for (table, uid, date), partition_files in spool_files.items():
+        table_directory = processed_data_directory+table+'/'
+        with stage('read_spool') as record:
+            processed_data = pd.concat([pd.read_parquet(spool_file) for spool_file in partition_files], ignore_index=True)
+            record['rows'] = len(processed_data)
+        with stage('read_store') as record:
+            stored_data = read_partition(table_directory, uid, date)
+            record['rows'] = 0 if stored_data is None else len(stored_data)
+        with stage('drop_duplicate_packets') as record:
+            processed_data, n_duplicates = drop_duplicate_packets(processed_data, stored_data)
+            record['rows'] = n_duplicates
+        if len(processed_data) > 0:
+            with stage('write_store') as record:
+                partition_data = processed_data
+                if stored_data is not None:
+                    partition_data = pd.concat([stored_data, processed_data], ignore_index=True)
+                write_partition(partition_data.sort_values(by=['time'], kind='stable'), table_directory, uid, date)
+                record['rows'] = len(processed_data)
+        backfill = backfill or behind_watermark(processed_data, last_time)
+        new_last_time = update_watermark(processed_data, new_last_time)
+        n_new_packets[table] += len(processed_data)
+        n_duplicate_packets[table] += n_duplicates
+        for spool_file in partition_files:
+            os.remove(spool_file)
+    return n_new_packets, n_duplicate_packets, new_last_time, backfill
+#endregion
+
+#region ingest
+# set directory locations (raw and processed data directories are set in cryowurst_manifest.py)
+store_directory = processed_data_directory+'satellite_data/'
+csv_file_name = processed_data_directory+'satellite_data_processed.csv'
+report_file_name = processed_data_directory+'run_report.jsonl'
+
+def ingest (full=False, export_csv=False, chunk_lines=20000, jobs=None, files=None):
+    # decodes new or changed cloudloop files (every file if full) and appends their packets to the stores
+    # files = cloudloop files to look at (every file in raw_data_directory if None). new or changed files that
+    # aren't listed are left for a later run
+    # returns a summary: new_files, n_new_packets per table, and the watermark (last packet time in seconds
+    # for each UID) before and after this run. unless backfill is set, packets newer than previous_last_time are
+    # the ones just added. backfill = some new packets are older than that (e.g. an older export arrived late)
+    # create raw and processed data directories if they don't already exist
+    for directory in [working_directory+'/data/', raw_data_directory, processed_data_directory]:
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    # incremental ingest: only files that are new or have changed since the last run are decoded,
+    # and only packets that aren't in the store yet are added to it, whatever their time.
+    # if there is no manifest or store yet (or full is set), everything is reprocessed
+    with stage('load_manifest'):
+        manifest = load_manifest(manifest_file_name)
+    full_run = full or not os.path.exists(store_directory) or len(manifest['files']) == 0
+    if full_run:
+        # the empty manifest is saved straight away, so an interrupted run starts from scratch again next time
+        with stage('clear_store'):
+            manifest = {'files': {}, 'last_time': {}}
+            for packet_type in packet_types.values():
+                clear_processed_store(processed_data_directory+packet_type['table']+'/')
+            save_manifest(manifest, manifest_file_name)
+    previous_last_time = dict(manifest['last_time'])
+
+    # find new or changed cloudloop data in the data directory
+    with stage('find_files') as record:
+        new_files = changed_raw_files(raw_data_directory, manifest)
+        if files is not None:
+            file_names = set(os.path.basename(file) for file in files)
+            new_files = [file for file in new_files if os.path.basename(file) in file_names]
+        record['rows'] = len(new_files)
+
+    # decode data and save to output file
+    jobs = jobs or min(len(new_files), os.cpu_count() or 1)
+    spool_directory = tempfile.mkdtemp(prefix='spool-', dir=processed_data_directory)
+    try:
+        with stage('decode') as record:
+            spool_chunks, n_duplicate_lines = decode_files_to_spool(new_files, spool_directory, chunk_lines, jobs)
+            record['rows'] = len(spool_chunks)
+        with stage('merge') as record:
+            n_new_packets, n_duplicate_packets, manifest['last_time'], backfill = merge_spool_into_store(
+                spool_chunks, processed_data_directory, manifest['last_time'])
+            record['rows'] = sum(n_new_packets.values())
+    finally:
+        shutil.rmtree(spool_directory, ignore_errors=True)
+
+    with stage('save_manifest'):
+        for file in new_files:
+            manifest['files'][os.path.basename(file)] = file_fingerprint(file)
+        save_manifest(manifest, manifest_file_name)
+
+    print('Removed '+str(n_duplicate_lines)+' duplicate satellite line(s) and '+str(sum(n_duplicate_packets.values()))+' duplicate packet(s).')
+    for table in n_new_packets:
+        print(str(n_new_packets[table])+' new packet(s) saved to '+processed_data_directory+table+'/.')
+    if backfill:
+        print('Some new packets are older than packets already processed - backfilled data were merged into the store.')
+
+    # optional .csv export of everything in the store
+    if export_csv:
+        with stage('export_csv') as record:
+            processed_data = read_processed_store(store_directory)
+            processed_data.to_csv(csv_file_name, index=False)
+            record['rows'] = len(processed_data)
+        print('Processed data exported to '+csv_file_name+'.')
+
+    return {'new_files': new_files, 'full_run': full_run, 'n_new_packets': n_new_packets, 'backfill': backfill,
+            'previous_last_time': previous_last_time, 'last_time': manifest['last_time']}
 #endregion
 
-# set directory locations
-# create raw and processed data directories if they don't already exist
-working_directory = os.path.dirname(os.path.abspath(__file__))
-
-if not os.path.exists(working_directory+'/data/'):
-    os.makedirs(working_directory+'/data/')
-
-raw_data_directory = working_directory+'/data/raw/'
-if not os.path.exists(raw_data_directory):
-    os.makedirs(raw_data_directory)
-
-processed_data_directory = working_directory+'/data/processed/'
-if not os.path.exists(processed_data_directory):
-    os.makedirs(processed_data_directory)
-
-
-# load all cloudloop data in the data directory
-# this just looks for all .csv files with 'cloudloop' in the name, and adds them to the dataframe
-all_data=[]
-file_list = glob.glob(raw_data_directory+'*cloudloop*.csv') 
-#file = file_list[0]
-for file in file_list:
-    df = pd.read_csv(file, header=None, usecols=[0])
-    df = df.dropna()
-    df = df.to_numpy().squeeze()
-    all_data = np.concatenate((all_data, df), axis=0)
-all_data.squeeze()
- 
-
-#region decode data and save to output file
-
-output_file_name = processed_data_directory+'satellite_data_processed.csv'
-output_file = open(output_file_name, 'w')
-output_file.write('time,UID,tmp_temp,keller_temp,pressure,mag_x,mag_y,mag_z,imu_x,imu_y,imu_z,tilt_x,tilt_y,tilt_z,tilt_pitch,tilt_roll,ec,wurst_voltage,logger_voltage,logger_pressure,logger_temp,channel_number')
-output_file.write("\n")
-
-for index in range(len(all_data)):
-    # each satellite packet contains multiple cryowurst packets
-    satellite_packet = bytes.fromhex(all_data[index])  
-    if satellite_packet[0:2] == b'W2':    #decode only wurst packets (not other instruments)
-        wurst_packet_length = 62
-        n=0
-        sat_packet_length = len(satellite_packet)
-        
-        #decode data from each individual packet
-        while n<=sat_packet_length-wurst_packet_length:
-            single_packet = satellite_packet[n:n+wurst_packet_length]
-
-            time_binary = int.from_bytes(single_packet[2:6], byteorder = 'little', signed=True)
-            time_formatted = datetime.datetime.fromtimestamp(time_binary)
-
-            raw_uid = int.from_bytes(single_packet[21:25], byteorder = 'little', signed=False)
-
-            raw_tmp_temp = int.from_bytes(single_packet[28:30], byteorder = 'little', signed=True)
-            
-            raw_pressure = int.from_bytes(single_packet[54:56], byteorder = 'little', signed=False)
-
-            raw_keller_temp = int.from_bytes(single_packet[57:59], byteorder = 'little', signed=True)
-
-            raw_mag_x = int.from_bytes(single_packet[30:32], byteorder = 'little', signed=False)
-            raw_mag_y = int.from_bytes(single_packet[32:34], byteorder = 'little', signed=False)
-            raw_mag_z = int.from_bytes(single_packet[34:36], byteorder = 'little', signed=False)
-
-            raw_imu_x = int.from_bytes(single_packet[36:38], byteorder = 'little', signed=True)
-            raw_imu_y = int.from_bytes(single_packet[38:40], byteorder = 'little', signed=True)
-            raw_imu_z = int.from_bytes(single_packet[40:42], byteorder = 'little', signed=True)
-            
-            raw_tilt_x = int.from_bytes(single_packet[42:44], byteorder = 'little', signed=True)
-            raw_tilt_y = int.from_bytes(single_packet[44:46], byteorder = 'little', signed=True)
-            raw_tilt_z = int.from_bytes(single_packet[46:48], byteorder = 'little', signed=True)
-
-            raw_tilt_pitch = int.from_bytes(single_packet[48:50], byteorder = 'little', signed=True)
-            raw_tilt_roll= int.from_bytes(single_packet[50:52], byteorder = 'little', signed=True)
-            raw_ec = int.from_bytes(single_packet[52:54], byteorder = 'little', signed=False)
-
-            raw_wurst_voltage = int.from_bytes(single_packet[58:60], byteorder = 'little', signed=True)
-            
-            raw_logger_voltage = int.from_bytes(single_packet[14:16], byteorder = 'little', signed=True)
-            raw_logger_pressure= int.from_bytes(single_packet[10:14], byteorder = 'little', signed=True)
-            [raw_logger_temp]= struct.unpack('f', single_packet[6:10])
-            channel_number = int.from_bytes(single_packet[16:17], byteorder='little', signed=False)
-
-            #write to file
-            output_file.write(str(time_formatted))
-            output_file.write(",")
-            output_file.write('{0:x}'.format(raw_uid))
-            output_file.write(",")
-            output_file.write(str(raw_tmp_temp*0.0078125))
-            output_file.write(",")
-            output_file.write(str(convert_keller_temperature(raw_keller_temp)))
-            output_file.write(",")
-            output_file.write(str(convert_keller_pressure(raw_pressure)))
-            output_file.write(",")
-            output_file.write(str(raw_mag_x))
-            output_file.write(",")
-            output_file.write(str(raw_mag_y))
-            output_file.write(",")
-            output_file.write(str(raw_mag_z))
-            output_file.write(",")
-            output_file.write(str(raw_imu_x*(1000/16384)))
-            output_file.write(",")
-            output_file.write(str(raw_imu_y*(1000/16384)))
-            output_file.write(",")
-            output_file.write(str(raw_imu_z*(1000/16384)))
-            output_file.write(",")
-            output_file.write(str(raw_tilt_x))
-            output_file.write(",")
-            output_file.write(str(raw_tilt_y))
-            output_file.write(",")
-            output_file.write(str(raw_tilt_z))
-            output_file.write(",")
-            output_file.write(str(raw_tilt_pitch*0.1))
-            output_file.write(",")
-            output_file.write(str(raw_tilt_roll*0.1))
-            output_file.write(",")
-            output_file.write(str(raw_ec))
-            output_file.write(",")
-            output_file.write(str(raw_wurst_voltage))
-            output_file.write(",")
-            output_file.write(str(raw_logger_voltage))
-            output_file.write(",")
-            output_file.write(str(raw_logger_pressure))
-            output_file.write(",")
-            output_file.write(str(raw_logger_temp))
-            output_file.write(",")
-            output_file.write(str(channel_number))
-            output_file.write("\n")
-
-
-            n+=wurst_packet_length
-
-print('All done! Processed data saved as '+output_file_name+'.')
+if __name__ == '__main__':
+    # same as python cryowurst.py ingest. this module is passed in, so it isn't imported a second time
+    from cryowurst import make_parser, run_ingest
+    args = make_parser('ingest').parse_args(['ingest'] + sys.argv[1:])
+    run_ingest(args, args.command_parser, sys.modules[__name__])
@@ -0,0 +1,141 @@
+# per-stage instrumentation for the ingest and plotting scripts.
+# each named stage records its wall time, CPU time (including finished worker processes), the peak memory of the
+# process so far, and the number of rows (lines, packets or figures) it handled:
+# with stage('decode') as record:
+#     ...
+#     record['rows'] = len(processed_data)
+# stages that run many times (e.g. once per chunk) are added up into one record per stage name.
+# at the end of a run, write_run_report adds one JSON line per stage to the run report, e.g.
+# {"run": "2024-11-28T10:00:00", "script": "ingest", "stage": "decode", "calls": 3, "wall_seconds": 0.5, ...}
+# with trace_memory set, the peak memory allocated by python and numpy during each stage is also recorded
+# (peak_mb, traced with tracemalloc - this slows things down). max_rss_mb is the peak memory of the whole process.
+# with profile_stage set, that stage is run under cProfile and the profile is saved next to the run report,
+# e.g. profile_decode.prof (open it with python -m pstats, or snakeviz). Stages that run in worker processes are
+# only profiled with a single job (--jobs 1).
+
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+try:
+    import resource
+except ImportError:
+    # not available on Windows - max_rss_mb is not recorded there
+    resource = None
+
+
+# settings for this run, set from the command line
+stage_settings = {'trace_memory': False, 'profile_stage': None}
+
+# records of the stages run so far (in this process), and the profiler of the profiled stage
+stage_records = []
+profilers = {}
+# peak traced memory (bytes) of each stage that is running, outermost first, when stages are nested
+open_stage_peaks = []
+run_start = datetime.datetime.now().isoformat(timespec='seconds')
+
+def max_rss_mb ():
+    # peak resident memory of this process so far, in MB
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kB everywhere else
+    return max_rss/1e6 if sys.platform == 'darwin' else max_rss/1e3
+
+def cpu_seconds ():
+    # CPU time used by this process and its finished child processes (worker pools)
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+@contextlib.contextmanager
+def stage (name, records=None):
+    # times the code in the with block as stage name, and adds a record of it to records (stage_records if None)
+    # the record is yielded, so counts can be added to it, e.g. record['rows'] = len(data)
+    if records is None:
+        records = stage_records
+    record = {'stage': name, 'calls': 1, 'rows': None, 'wall_seconds': None, 'cpu_seconds': None,
+              'max_rss_mb': None, 'peak_mb': None}
+    if stage_settings['trace_memory']:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        # the peak so far belongs to the stages this one is nested in. it is kept for them before resetting
+        open_stage_peaks[:] = [max(peak, tracemalloc.get_traced_memory()[1]) for peak in open_stage_peaks]
+        tracemalloc.reset_peak()
+        open_stage_peaks.append(0)
+    profiler = None
+    if stage_settings['profile_stage'] == name:
+        profiler = profilers.setdefault(name, cProfile.Profile())
+    start_wall = time.perf_counter()
+    start_cpu = cpu_seconds()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        record['wall_seconds'] = time.perf_counter() - start_wall
+        record['cpu_seconds'] = cpu_seconds() - start_cpu
+        record['max_rss_mb'] = max_rss_mb()
+        if stage_settings['trace_memory']:
+            peak = max(open_stage_peaks.pop(), tracemalloc.get_traced_memory()[1])
+            open_stage_peaks[:] = [max(outer_peak, peak) for outer_peak in open_stage_peaks]
+            record['peak_mb'] = peak/1e6
+        records.append(record)
+
+def timed_chunks (chunks, name, records=None):
+    # yields each chunk of an iterator (e.g. a chunked file reader), recording the time taken to produce it as stage name
+    chunks = iter(chunks)
+    while True:
+        with stage(name, records) as record:
+            chunk = next(chunks, None)
+            record['rows'] = 0 if chunk is None else len(chunk)
+        if chunk is None:
+            return
+        yield chunk
+
+def add_stage_records (records):
+    # adds records (e.g. returned from worker processes) to stage_records
+    stage_records.extend(records)
+
+def combined_records (records):
+    # one record per stage name, in order of first appearance: times, calls and rows are added up, memory is the highest
+    combined = {}
+    for record in records:
+        if record['stage'] not in combined:
+            combined[record['stage']] = dict(record)
+            continue
+        total = combined[record['stage']]
+        for key in ['calls', 'wall_seconds', 'cpu_seconds', 'rows']:
+            if record[key] is not None:
+                total[key] = record[key] if total[key] is None else total[key] + record[key]
+        for key in ['max_rss_mb', 'peak_mb']:
+            if record[key] is not None:
+                total[key] = record[key] if total[key] is None else max(total[key], record[key])
+    return list(combined.values())
+
+def profile_file_name (report_file_name, name):
+    # profile_<stage>.prof next to the run report, with anything but letters, digits and _ in the stage name as _
+    return os.path.join(os.path.dirname(report_file_name), 'profile_'+re.sub(r'\W', '_', name)+'.prof')
+
+def write_run_report (report_file_name, script):
+    # appends the stages run so far to the run report (JSON lines) and saves the profile of the profiled stage,
+    # then clears them, ready for the next run (e.g. the next update in watch mode)
+    global run_start
+    report_directory = os.path.dirname(report_file_name)
+    if report_directory and not os.path.exists(report_directory):
+        os.makedirs(report_directory)
+    with open(report_file_name, 'a') as report_file:
+        for record in combined_records(stage_records):
+            report_file.write(json.dumps(dict({'run': run_start, 'script': script}, **record))+'\n')
+    for name, profiler in profilers.items():
+        profiler.dump_stats(profile_file_name(report_file_name, name))
+        print('Profile of stage '+name+' saved to '+profile_file_name(report_file_name, name)+'.')
+    stage_records.clear()
+    profilers.clear()
+    run_start = datetime.datetime.now().isoformat(timespec='seconds')
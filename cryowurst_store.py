@@ -0,0 +1,104 @@
+# reads and writes the processed data stores (wurst data, and other packet types in their own tables).
+# processed data are kept as parquet files, partitioned by wurst UID and by day of measurement:
+# data/processed/satellite_data/UID=cf240002/date=2024-11-28/<part>.parquet
+# each partition is kept as a single file, sorted by time: adding data to a partition rewrites it, so incremental
+# runs don't leave a trail of small files that slow down reading.
+# timestamps and sensor values keep their types, so nothing needs to be re-parsed when plotting,
+# and readers can load only the columns and wurste/days they need.
+# columns are the same as the processed .csv file (see cryowurst_raw_data_process.py)
+
+import glob
+import os
+import shutil
+import uuid
+import pandas as pd
+
+
+# columns of the processed data, in order
+processed_columns = ['time', 'UID', 'tmp_temp', 'keller_temp', 'pressure', 'mag_x', 'mag_y', 'mag_z',
+                     'imu_x', 'imu_y', 'imu_z', 'tilt_x', 'tilt_y', 'tilt_z', 'tilt_pitch', 'tilt_roll',
+                     'ec', 'wurst_voltage', 'logger_voltage', 'logger_pressure', 'logger_temp', 'channel_number']
+
+partition_columns = ['UID', 'date']
+
+# format of the time column in the .csv export
+processed_time_format = '%Y-%m-%d %H:%M:%S'
+
+def clear_processed_store (store_directory):
+    # removes all processed data, ready for a full reprocess
+    if os.path.exists(store_directory):
+        shutil.rmtree(store_directory)
+
+def partition_directory (store_directory, uid, date):
+    # directory of one partition of the store, e.g. <store_directory>/UID=cf240002/date=2024-11-28
+    return os.path.join(store_directory, 'UID='+uid, 'date='+date)
+
+def partition_dates (processed_data):
+    # day of measurement of each row, as 'YYYY-MM-DD' strings (the date partition)
+    return processed_data['time'].values.astype('datetime64[D]').astype(str)
+
+def read_partition (store_directory, uid, date):
+    # loads everything in one partition of the store, with the UID column put back (None if the partition is empty)
+    directory = partition_directory(store_directory, uid, date)
+    if len(glob.glob(os.path.join(directory, '*.parquet'))) == 0:
+        return None
+    partition_data = pd.read_parquet(directory)
+    partition_data.insert(1, 'UID', uid)
+    return partition_data
+
+def write_partition (partition_data, store_directory, uid, date):
+    # replaces everything in one partition with a single file of partition_data
+    # the new file is written under a hidden name (ignored by readers) and moved into place before the old files
+    # are removed, so an interrupted write leaves the old data or (at worst) duplicate rows, never missing rows
+    directory = partition_directory(store_directory, uid, date)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    old_files = glob.glob(os.path.join(directory, '*.parquet'))
+    part_name = uuid.uuid4().hex+'.parquet'
+    temporary_file = os.path.join(directory, '.'+part_name)
+    partition_data.drop(columns=partition_columns, errors='ignore').to_parquet(temporary_file, index=False)
+    os.replace(temporary_file, os.path.join(directory, part_name))
+    for old_file in old_files:
+        os.remove(old_file)
+
+def read_processed_store (store_directory, columns=None, uids=None, start_date=None, end_date=None):
+    # loads processed wurst data from the store
+    # columns = list of columns to load (all columns if None). 'time' and 'UID' are always loaded
+    # works for any table whose partitions were written with write_partition, not just the wurst data
+    # uids = list of wurst UIDs to load (all wurste if None)
+    # start_date, end_date = first and last day to load, as 'YYYY-MM-DD' strings (inclusive)
+    if not os.path.exists(store_directory):
+        raise FileNotFoundError('no processed data found in '+store_directory+', run cryowurst_raw_data_process.py first')
+
+    if columns is not None:
+        columns = ['time', 'UID'] + [column for column in columns if column not in ('time', 'UID')]
+
+    filters = []
+    if uids is not None:
+        filters.append(('UID', 'in', list(uids)))
+    if start_date is not None:
+        filters.append(('date', '>=', start_date))
+    if end_date is not None:
+        filters.append(('date', '<=', end_date))
+
+    processed_data = pd.read_parquet(store_directory, columns=columns, filters=filters or None)
+
+    # partition columns come back as categoricals - turn UID back into plain strings
+    processed_data['UID'] = processed_data['UID'].astype(str)
+    if columns is None:
+        # partition columns are read last - put UID back in second place, after time
+        columns = ['time', 'UID'] + [column for column in processed_data.columns
+                                     if column not in ['time', 'UID'] + partition_columns]
+    processed_data = processed_data[columns]
+    return processed_data.sort_values(by=['time'], kind='stable').reset_index(drop=True)
+
+def read_processed_csv (csv_file_name, columns=None):
+    # loads processed wurst data from a .csv export (e.g. satellite_data_processed.csv)
+    # times are parsed in a single vectorized pass with a fixed format
+    if columns is not None:
+        columns = ['time', 'UID'] + [column for column in columns if column not in ('time', 'UID')]
+    processed_data = pd.read_csv(csv_file_name, usecols=columns, dtype={'UID': str})
+    processed_data['time'] = pd.to_datetime(processed_data['time'], format=processed_time_format)
+    if columns is not None:
+        processed_data = processed_data[columns]
+    return processed_data.sort_values(by=['time'], kind='stable').reset_index(drop=True)
@@ -0,0 +1,197 @@
+# generates synthetic raw data at any scale, for benchmarking (see cryowurst_benchmark.py) and for trying out
+# the pipeline on deployments bigger than the real one.
+# OUTPUT, in the given directory:
+# data/raw/cloudloop_<first day>_to_<last day>.csv = W2 wurst packets as satellite hex lines, like the cloudloop
+#   exports (4 packets per line, one file per --days-per-file days)
+# data/raw/300234068884730_synthetic.txt = hourly weather station records, like the DataGarrison files
+# wurst_colours.toml = instrument registry for the synthetic wurste (UIDs cf240001, cf240002, ...)
+# scale = number of wurste x number of days x samples per day per wurst. Values follow the real data: temperatures
+# just below zero getting colder with depth, overburden pressure, slowly drifting tilt and battery voltages,
+# and daily cycles in the logger and weather data. The same seed always gives the same files.
+# run as e.g. python cryowurst_synthetic.py /tmp/synthetic --instruments 30 --days 120
+
+import argparse
+import colorsys
+import os
+import numpy as np
+import pandas as pd
+import toml
+from cryowurst_raw_data_process import wurst_packet_dtype, format_hex
+from cryowurst_weather import weather_time_column, weather_time_format
+
+
+# first UID of the synthetic wurste - the instrument number is added to it
+synthetic_uid_base = 0xcf240000
+# same station id as the real weather files, so they are found by the plotting code
+synthetic_weather_file = '300234068884730_synthetic.txt'
+
+# weather station columns, as in the DataGarrison files
+weather_sensor_columns = ['Pressure_20290338_mbar', 'Temperature_20339014_°C', 'RH_20339014_%',
+                          'Wind Speed_20339187_km/hr', 'Gust Speed_20339187_km/hr', 'Wind Direction_20339187_°',
+                          'SW-IN_SDI_0_0_W/m^2', 'SW-OUT_SDI_0_1_W/m^2', 'LW-IN_SDI_0_2_W/m^2', 'LW-OUT_SDI_0_3_W/m^2']
+
+#region wurst packets
+def synthetic_depths (n_instruments):
+    # installation depths of the synthetic wurste, evenly spaced from near the surface to the bed
+    return np.linspace(20, 160, n_instruments)
+
+def synthetic_wurst_packets (n_instruments, days, samples_per_day, start='2024-07-22', seed=0):
+    # returns an array of wurst packets (wurst_packet_dtype), in order of time. Each wurst samples samples_per_day
+    # times a day, a few seconds after the previous one
+    rng = np.random.default_rng(seed)
+    n_samples = int(days*samples_per_day)
+    n_packets = n_samples*n_instruments
+    start_time = np.datetime64(start, 's').astype(np.int64)
+    sample_times = start_time + (np.arange(n_samples)*(86400/samples_per_day)).astype(np.int64)
+    times = (sample_times[:, None] + 10*np.arange(n_instruments)[None, :]).reshape(-1)
+    instrument = np.tile(np.arange(n_instruments), n_samples)
+    depth = synthetic_depths(n_instruments)[instrument]
+    # fraction of the way through the record, and time of day in radians, for drifts and daily cycles
+    progress = np.repeat(np.arange(n_samples)/max(n_samples - 1, 1), n_instruments)
+    time_of_day = 2*np.pi*(times % 86400)/86400
+
+    def noise (scale):
+        return rng.normal(0, scale, n_packets)
+
+    packets = np.zeros(n_packets, dtype=wurst_packet_dtype)
+    packets['header'] = b'W2'
+    packets['time'] = times
+    packets['logger_temp'] = -7 + 6*np.sin(time_of_day) + noise(1)
+    packets['logger_pressure'] = 1146970000 + (100000*np.sin(2*np.pi*progress*days/5) + noise(20000)).astype(np.int64)
+    packets['logger_voltage'] = (3030 + 60*np.sin(time_of_day) + noise(20)).astype(np.int16)
+    packets['channel_number'] = 2
+    packets['uid'] = synthetic_uid_base + 1 + instrument
+    temperature = -0.02 - 0.1*depth/160 + noise(0.01)
+    packets['tmp_temp'] = np.round(temperature/0.0078125).astype(np.int16)
+    packets['mag_x'] = (250 + noise(5)).astype(np.uint16)
+    packets['mag_y'] = (200 + noise(5)).astype(np.uint16)
+    packets['mag_z'] = (65300 + noise(5)).astype(np.uint16)
+    packets['imu_x'] = (-16400 + noise(20)).astype(np.int16)
+    packets['imu_y'] = (1000*np.sin(instrument) + noise(20)).astype(np.int16)
+    packets['imu_z'] = (-400 + noise(20)).astype(np.int16)
+    packets['tilt_x'] = (-50 + noise(2)).astype(np.int16)
+    packets['tilt_y'] = (30 + noise(2)).astype(np.int16)
+    packets['tilt_z'] = (-993 + noise(2)).astype(np.int16)
+    packets['tilt_pitch'] = (-30 - 50*progress*depth/160 + noise(2)).astype(np.int16)
+    packets['tilt_roll'] = (20 + 30*progress*depth/160 + noise(2)).astype(np.int16)
+    packets['ec'] = (1000 + 400*np.cos(instrument) + noise(10)).astype(np.uint16)
+    # overburden pressure of ice plus a small water pressure signal, as keller counts (30 bar sensor)
+    pressure = depth*0.0899 + 0.5*np.sin(2*np.pi*progress*days/3) + noise(0.01)
+    packets['pressure'] = (pressure*(32768/30) + 16384).clip(0, 65535).astype(np.uint16)
+    packets['keller_temp'] = ((((temperature + 50)/0.05 + 24)).astype(np.int64) << 4).astype(np.int16)
+    # wurst_voltage overlaps the keller temperature, so it is set last
+    packets['wurst_voltage'] = (3475 - 15*progress + noise(2)).astype(np.int16)
+    return packets
+
+def satellite_lines (packets, packets_per_line=4):
+    # packs wurst packets into satellite hex lines of packets_per_line packets each, in order
+    raw = np.frombuffer(packets.tobytes(), dtype=np.uint8).reshape(len(packets), packets.dtype.itemsize)
+    n_full_lines = len(packets) // packets_per_line
+    lines = []
+    if n_full_lines > 0:
+        lines = list(format_hex(raw[:n_full_lines*packets_per_line].reshape(n_full_lines, -1)))
+    if len(packets) % packets_per_line != 0:
+        lines += list(format_hex(raw[n_full_lines*packets_per_line:].reshape(1, -1)))
+    return lines
+
+def write_cloudloop_files (packets, raw_data_directory, days_per_file=7):
+    # writes packets to cloudloop-style exports of days_per_file days each. returns the file names
+    days = packets['time'].astype(np.int64) // 86400
+    file_list = []
+    for first_day in range(days.min(), days.max() + 1, days_per_file):
+        file_packets = packets[(days >= first_day) & (days < first_day + days_per_file)]
+        if len(file_packets) == 0:
+            continue
+        first_date = str(np.datetime64(int(first_day), 'D'))
+        last_date = str(np.datetime64(int(min(first_day + days_per_file - 1, days.max())), 'D'))
+        file_name = os.path.join(raw_data_directory, 'cloudloop_'+first_date+'_to_'+last_date+'.csv')
+        with open(file_name, 'w', newline='\n') as cloudloop_file:
+            cloudloop_file.write('\n'.join(satellite_lines(file_packets))+'\n')
+        file_list.append(file_name)
+    return file_list
+#endregion
+
+#region weather and registry
+def synthetic_weather_data (days, samples_per_day=24, start='2024-07-22', utc_offset_minutes=-420, seed=0):
+    # returns weather station records with Date_Time in local station time, as in the DataGarrison files
+    rng = np.random.default_rng(seed + 1)
+    n_samples = int(days*samples_per_day)
+    utc_time = pd.Timestamp(start) + pd.to_timedelta(np.arange(n_samples)*(86400/samples_per_day), unit='s')
+    time_of_day = 2*np.pi*(utc_time.hour.values + utc_time.minute.values/60)/24
+    day = np.arange(n_samples)/samples_per_day
+    sunlight = np.clip(np.sin(time_of_day - np.pi/2), 0, None)
+    wind_speed = np.abs(15 + 10*np.sin(2*np.pi*day/4) + rng.normal(0, 5, n_samples))
+    values = {
+        'Pressure_20290338_mbar': 798 + 5*np.sin(2*np.pi*day/6) + rng.normal(0, 0.3, n_samples),
+        'Temperature_20339014_°C': -4 + 6*np.sin(time_of_day - np.pi/2) - day/30 + rng.normal(0, 1, n_samples),
+        'RH_20339014_%': np.clip(70 + rng.normal(0, 10, n_samples), 0, 100),
+        'Wind Speed_20339187_km/hr': wind_speed,
+        'Gust Speed_20339187_km/hr': wind_speed*1.5,
+        'Wind Direction_20339187_°': rng.uniform(180, 280, n_samples),
+        'SW-IN_SDI_0_0_W/m^2': 600*sunlight + rng.normal(0, 5, n_samples),
+        'SW-OUT_SDI_0_1_W/m^2': 450*sunlight + rng.normal(0, 5, n_samples),
+        'LW-IN_SDI_0_2_W/m^2': 210 + rng.normal(0, 5, n_samples),
+        'LW-OUT_SDI_0_3_W/m^2': 290 + rng.normal(0, 5, n_samples),
+    }
+    local_time = utc_time + pd.Timedelta(minutes=utc_offset_minutes)
+    weather_data = pd.DataFrame({weather_time_column: local_time.strftime(weather_time_format)})
+    for column in weather_sensor_columns:
+        weather_data[column] = values[column]
+    return weather_data
+
+def write_weather_file (weather_data, file_name, utc_offset_minutes=-420):
+    # writes weather records in the DataGarrison format: two lines of station information, then tab separated columns
+    with open(file_name, 'w', encoding='utf-8', newline='') as weather_file:
+        weather_file.write('DataGarrison Station - ID 8388608\r\n')
+        weather_file.write('Time zone: UTC '+str(utc_offset_minutes)+' minutes\r\n')
+        weather_data.to_csv(weather_file, sep='\t', index=False, float_format='%.3f', lineterminator='\r\n')
+
+def synthetic_colours (n_instruments):
+    # an evenly spaced hue for each wurst, with a lighter and darker version (c1, c2, c3 in the registry)
+    colours = []
+    for number in range(n_instruments):
+        hue = number/n_instruments
+        colours.append([dict(zip('rgb', colorsys.hls_to_rgb(hue, lightness, 0.65))) for lightness in (0.55, 0.75, 0.35)])
+    return colours
+
+def write_registry (n_instruments, file_name):
+    # writes an instrument registry for the synthetic wurste, in the format of wurst_colours.toml
+    registry = {}
+    depths = synthetic_depths(n_instruments)
+    for number, (depth, colour) in enumerate(zip(depths, synthetic_colours(n_instruments)), start=1):
+        registry['wurst'+str(number)] = {'uid': '{0:x}'.format(synthetic_uid_base + number), 'depth': float(depth),
+                                         'basal': bool(depth >= depths.max() - 20),
+                                         'c1': colour[0], 'c2': colour[1], 'c3': colour[2]}
+    with open(file_name, 'w') as registry_file:
+        toml.dump(registry, registry_file)
+#endregion
+
+def generate_dataset (directory, n_instruments=4, days=30, samples_per_day=24, days_per_file=7, seed=0):
+    # writes a complete synthetic dataset to directory (see top of file). returns a summary of what was written
+    raw_data_directory = os.path.join(directory, 'data', 'raw')
+    if not os.path.exists(raw_data_directory):
+        os.makedirs(raw_data_directory)
+    packets = synthetic_wurst_packets(n_instruments, days, samples_per_day, seed=seed)
+    cloudloop_files = write_cloudloop_files(packets, raw_data_directory, days_per_file)
+    weather_file = os.path.join(raw_data_directory, synthetic_weather_file)
+    write_weather_file(synthetic_weather_data(days, seed=seed), weather_file)
+    registry_file = os.path.join(directory, 'wurst_colours.toml')
+    write_registry(n_instruments, registry_file)
+    return {'cloudloop_files': cloudloop_files, 'weather_files': [weather_file], 'registry_file': registry_file,
+            'n_packets': len(packets)}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='generate synthetic raw wurst and weather station data')
+    parser.add_argument('directory', help='where to write the dataset (raw files go in <directory>/data/raw/)')
+    parser.add_argument('--instruments', type=int, default=4, help='number of wurste (default: 4)')
+    parser.add_argument('--days', type=float, default=30, help='number of days of data (default: 30)')
+    parser.add_argument('--samples-per-day', type=float, default=24,
+                        help='samples per day from each wurst (default: 24)')
+    parser.add_argument('--days-per-file', type=int, default=7, help='days of data in each cloudloop file (default: 7)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    args = parser.parse_args()
+
+    dataset = generate_dataset(args.directory, args.instruments, args.days, args.samples_per_day,
+                               args.days_per_file, args.seed)
+    print('All done! '+str(dataset['n_packets'])+' packets in '+str(len(dataset['cloudloop_files']))+
+          ' cloudloop file(s) saved in '+os.path.join(args.directory, 'data', 'raw')+'.')
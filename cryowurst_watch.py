@@ -0,0 +1,208 @@
+# keeps the plots up to date as new data arrive in data/raw/.
+# runs the same ingest as cryowurst_raw_data_process.py and draws the same figures as cryowurst_data_allplots.py,
+# but stays running: data/raw/ is checked every --interval seconds for new or changed files.
+# new or changed cloudloop .csv files = new packets are decoded into the store, and only those packets are read back
+#   and added to the processed data held in memory. Figures drawn from the wurst data are re-rendered
+# new or changed weather station .txt files = only that file is re-read, and only figures that use weather data
+#   (wurst_pressure) are re-rendered
+# a file is only picked up once its size and modification time are the same on two checks in a row, and only
+# those files are ingested, so files that are still being downloaded or copied are left alone until they are complete
+# (the ingest at start up takes every file as it is - a file that is still growing is decoded again once it changes)
+# if an update fails (e.g. a file that can't be read yet, or a locked store file), its files are tried again on later
+# checks, waiting twice as long after each failure (up to max_retry_seconds), or straight away if they change again.
+# processed data and weather data are loaded once at start up and kept in memory between checks.
+# run with --only to keep some of the figures up to date, e.g. --only wurst_pressure temp_depth
+# the time and memory use of each stage of every update are added to data/processed/run_report.jsonl
+# stop with ctrl+c
+
+import datetime
+import glob
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+import cryowurst_raw_data_process as process
+import cryowurst_data_allplots as allplots
+from cryowurst_store import read_processed_store
+from cryowurst_weather import load_weather_data
+from cryowurst_stages import write_run_report
+
+
+# raw files to watch
+cloudloop_pattern = process.raw_data_directory+'*cloudloop*.csv'
+weather_pattern = process.raw_data_directory+'300234068884730*.txt'
+# longest wait before trying a failed update again
+max_retry_seconds = 3600
+
+#region watching
+def snapshot (pattern):
+    # size and modification time of every file matching pattern
+    files = {}
+    for file in glob.glob(pattern):
+        try:
+            stat = os.stat(file)
+        except FileNotFoundError:
+            continue
+        files[file] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+def settled_changes (seen, previous, current):
+    # files that are new or changed since they were last handled (seen), and haven't changed since the last check
+    return {file: signature for file, signature in current.items()
+            if seen.get(file) != signature and previous.get(file) == signature}
+
+def retry_wait (n_failures, interval):
+    # seconds to wait before trying a failed update again: twice as long after each failure, up to max_retry_seconds
+    return min(interval*2**(n_failures - 1), max_retry_seconds)
+
+def due_changes (changes, retries, now):
+    # changes that aren't waiting to be retried. retries = file -> (signature, number of failures, time of next try)
+    # a file that has changed since it failed is tried straight away
+    return {file: signature for file, signature in changes.items()
+            if file not in retries or retries[file][0] != signature or retries[file][2] <= now}
+
+def figure_inputs (name):
+    # inputs a figure is drawn from: 'wurst' (processed data store) and/or 'weather' (weather station files)
+    inputs = set()
+    if len(allplots.figures[name]['columns']) > 0:
+        inputs.add('wurst')
+    if len(allplots.figures[name]['weather_columns']) > 0:
+        inputs.add('weather')
+    return inputs
+
+def figures_to_render (figure_names, changed_inputs):
+    # figures that use any of the changed inputs, in the order they were given
+    return [name for name in figure_names if len(figure_inputs(name) & changed_inputs) > 0]
+#endregion
+
+#region warm data
+def new_packets (summary, columns):
+    # reads back only the packets added to the store by an ingest run: those newer than the previous
+    # watermark for their UID (so not after a backfill). only the days (and UIDs) that can hold new packets are read
+    previous_last_time = summary['previous_last_time']
+    uids = [uid for uid, last_time in summary['last_time'].items() if previous_last_time.get(uid) != last_time]
+    if len(uids) == 0:
+        return None
+    start_date = None
+    if all(uid in previous_last_time for uid in uids):
+        first_time = min(previous_last_time[uid] for uid in uids)
+        start_date = str(np.datetime64(first_time, 's').astype('datetime64[D]'))
+    new_data = read_processed_store(process.store_directory, columns=columns, uids=uids, start_date=start_date)
+    packet_time = new_data['time'].values.astype('datetime64[s]').astype(np.int64)
+    watermark = new_data['UID'].map(previous_last_time).fillna(np.iinfo(np.int64).min).astype('int64')
+    return new_data[packet_time > watermark]
+
+def load_weather_files (weather_files, weather_columns):
+    # parsed weather data, one dataframe per file, so a changed file can be replaced on its own
+    cache_directory = allplots.working_directory+'/data/processed/weather/'
+    return {file: load_weather_data([file], columns=weather_columns, cache_directory=cache_directory)
+            for file in weather_files}
+
+def combined_weather_data (weather_frames):
+    # weather data of all files, in order of file name
+    if len(weather_frames) == 0:
+        return None
+    return pd.concat([weather_frames[file] for file in sorted(weather_frames)], ignore_index=True)
+#endregion
+
+def timestamp ():
+    return datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def watch (figure_names=None, interval=60, formats=None, jobs=None, chunk_lines=20000, pressure_correction='logger'):
+    # runs until stopped with ctrl+c
+    # figure_names = figures to keep up to date (all of them if None)
+    # interval = seconds between checks of the raw data directory
+    # pressure_correction = 'logger' or 'station', see allplots.pressure_correction_sources
+    allplots.render_settings['formats'] = formats
+
+    if not os.path.exists(allplots.output_path):
+        os.makedirs(allplots.output_path)
+
+    figure_names = figure_names or list(allplots.figures)
+    columns = allplots.figure_columns(figure_names)
+    weather_columns = allplots.figure_weather_columns(figure_names, pressure_correction)
+
+    # start up: bring the store up to date, load everything once and draw every figure
+    process.ingest(chunk_lines=chunk_lines, jobs=jobs)
+    seen = snapshot(cloudloop_pattern)
+    seen.update(snapshot(weather_pattern))
+    all_data = allplots.load_processed_data(columns)
+    weather_frames = {}
+    if len(weather_columns) > 0:
+        weather_frames = load_weather_files(sorted(snapshot(weather_pattern)), weather_columns)
+    plot_data = allplots.prepare_plot_data(all_data, combined_weather_data(weather_frames),
+                                           pressure_correction=pressure_correction)
+    allplots.render_figures(figure_names, plot_data, jobs=jobs)
+    write_run_report(process.report_file_name, 'watch')
+    print(timestamp()+' '+str(len(figure_names))+' figure(s) saved in '+allplots.output_path+'. Watching '+process.raw_data_directory+' ...')
+
+    previous = dict(seen)
+    # failed updates waiting to be tried again (see due_changes)
+    retries = {}
+    # inputs that changed since the figures were last rendered, kept until rendering succeeds
+    changed_inputs = set()
+    # set after a failed ingest, which may have added some packets to the store already: all data are read back
+    reload_wurst = False
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot(cloudloop_pattern)
+            current.update(snapshot(weather_pattern))
+            changes = due_changes(settled_changes(seen, previous, current), retries, time.monotonic())
+            previous = current
+            if len(changes) == 0:
+                continue
+
+            try:
+                changed_cloudloop = [file for file in changes if file.endswith('.csv')]
+                changed_weather = [file for file in changes if file.endswith('.txt')]
+
+                if len(changed_cloudloop) > 0:
+                    try:
+                        summary = process.ingest(chunk_lines=chunk_lines, jobs=jobs, files=changed_cloudloop)
+                    except Exception:
+                        reload_wurst = True
+                        raise
+                    if summary['full_run'] or summary['backfill'] or reload_wurst:
+                        # backfilled packets can be anywhere in time, so everything is read back
+                        all_data = allplots.load_processed_data(columns)
+                        changed_inputs.add('wurst')
+                        reload_wurst = False
+                    elif summary['n_new_packets']['satellite_data'] > 0:
+                        all_data = pd.concat([all_data, new_packets(summary, columns)], ignore_index=True)
+                        all_data = all_data.sort_values(by=['time'], kind='stable').reset_index(drop=True)
+                        changed_inputs.add('wurst')
+
+                if len(changed_weather) > 0 and len(weather_columns) > 0:
+                    weather_frames.update(load_weather_files(changed_weather, weather_columns))
+                    changed_inputs.add('weather')
+
+                render_names = figures_to_render(figure_names, changed_inputs)
+                if len(render_names) > 0:
+                    plot_data = allplots.prepare_plot_data(all_data, combined_weather_data(weather_frames),
+                                                           pressure_correction=pressure_correction)
+                    allplots.render_figures(render_names, plot_data, jobs=jobs)
+                changed_inputs.clear()
+                print(timestamp()+' '+str(len(changes))+' new or changed file(s), re-rendered: '+(', '.join(render_names) or 'nothing'))
+                seen.update(changes)
+                for file in changes:
+                    retries.pop(file, None)
+            except Exception as error:
+                # keep watching - the files are not marked as seen, so they are tried again on a later check
+                wait = 0
+                for file, signature in changes.items():
+                    n_failures = retries[file][1] + 1 if file in retries and retries[file][0] == signature else 1
+                    wait = max(wait, retry_wait(n_failures, interval))
+                    retries[file] = (signature, n_failures, time.monotonic() + retry_wait(n_failures, interval))
+                print(timestamp()+' failed to update from '+', '.join(sorted(changes))+': '+repr(error)+
+                      ', trying again in '+str(round(wait))+' s')
+            write_run_report(process.report_file_name, 'watch')
+    except KeyboardInterrupt:
+        print('Stopped watching.')
+
+if __name__ == '__main__':
+    # same as python cryowurst.py watch. this module is passed in, so it isn't imported a second time
+    from cryowurst import make_parser, run_watch
+    args = make_parser('watch').parse_args(['watch'] + sys.argv[1:])
+    run_watch(args, args.command_parser, sys.modules[__name__])
@@ -0,0 +1,130 @@
+# loads data from the Kaskawulsh weather station
+# weather data from Kaskawulsh weather station:
+# download latest .txt file from this address, and save in raw data directory
+# https://datagarrison.com/users/300034012631040/300234068884730/
+# files are tab separated, with two lines of station information before the column names:
+# DataGarrison Station - ID 8388608
+# Time zone: UTC -420 minutes
+# times in the Date_Time column are local station time. They are converted to UTC in the 'datetime' column,
+# so they line up with the wurst data
+# the header and any footer lines are found when loading, so the fast C parser can be used.
+# parsed files can be cached as parquet in a cache directory, keyed by the modification time of the raw file
+# attach_weather joins weather records onto wurst samples by time: each sample gets the values of the nearest
+# weather record, if there is one within weather_tolerance.
+
+import os
+import glob
+import re
+import numpy as np
+import pandas as pd
+
+
+weather_time_format = '%m/%d/%y %H:%M:%S'
+weather_time_column = 'Date_Time'
+station_pressure_column = 'Pressure_20290338_mbar'
+air_temperature_column = 'Temperature_20339014_°C'
+# weather records are hourly. samples with no record closer than this get NaN weather values
+weather_tolerance = pd.Timedelta(minutes=90)
+
+def read_weather_header (file_name):
+    # scans the start of a weather station file for the time zone and the line holding the column names
+    # returns (utc_offset_minutes, header_line_number). utc offset is minutes from UTC, e.g. -420 for UTC-7
+    utc_offset_minutes = None
+    with open(file_name, encoding='utf-8', errors='replace') as weather_file:
+        for line_number, line in enumerate(weather_file):
+            match = re.search(r'Time zone:\s*UTC\s*([+-]?\s*\d+)\s*minutes', line)
+            if match:
+                utc_offset_minutes = int(match.group(1).replace(' ', ''))
+            if line.startswith(weather_time_column):
+                if utc_offset_minutes is None:
+                    raise ValueError('no time zone found in header of weather station file '+file_name)
+                return utc_offset_minutes, line_number
+            if line_number > 20:
+                break
+    raise ValueError('no '+weather_time_column+' column found in header of weather station file '+file_name)
+
+def parse_weather_times (date_time, utc_offset_minutes):
+    # converts local station time strings to UTC datetimes in one vectorized pass
+    # anything that isn't a time (e.g. footer lines) becomes NaT
+    local_time = pd.to_datetime(date_time, format=weather_time_format, errors='coerce')
+    return local_time - pd.Timedelta(minutes=utc_offset_minutes)
+
+def read_weather_file (file_name):
+    # reads a single weather station file with the C parser
+    # footer lines (anything after the data without a valid time) are dropped
+    utc_offset_minutes, header_line_number = read_weather_header(file_name)
+    data = pd.read_csv(file_name, delimiter='\t', skiprows=header_line_number, engine='c',
+                       encoding='utf-8', encoding_errors='replace', on_bad_lines='skip')
+    # the header line ends with a tab, which gives an empty column at the end
+    data = data.loc[:, ~data.columns.str.startswith('Unnamed')]
+    data['datetime'] = parse_weather_times(data[weather_time_column], utc_offset_minutes)
+    data = data[data['datetime'].notna()]
+    sensor_columns = [column for column in data.columns if column not in (weather_time_column, 'datetime')]
+    data[sensor_columns] = data[sensor_columns].apply(pd.to_numeric, errors='coerce')
+    return data.reset_index(drop=True)
+
+def cached_weather_file (file_name, cache_directory, columns=None):
+    # reads a weather station file from the parquet cache if the raw file hasn't changed since it was cached,
+    # otherwise parses it and refreshes the cache. the cache file name includes the raw file mtime
+    basename = os.path.splitext(os.path.basename(file_name))[0]
+    cache_file = os.path.join(cache_directory, basename+'-'+str(os.stat(file_name).st_mtime_ns)+'.parquet')
+    if os.path.exists(cache_file):
+        return pd.read_parquet(cache_file, columns=columns)
+
+    data = read_weather_file(file_name)
+    if not os.path.exists(cache_directory):
+        os.makedirs(cache_directory)
+    for stale_file in glob.glob(os.path.join(cache_directory, basename+'-*.parquet')):
+        os.remove(stale_file)
+    data.to_parquet(cache_file, index=False)
+    if columns is not None:
+        data = data[columns]
+    return data
+
+def load_weather_data (weather_list, columns=None, cache_directory=None):
+    # combines available files from the weather station, in order of file name
+    # columns = sensor columns to load (all columns if None). 'Date_Time' and 'datetime' are always loaded
+    # cache_directory = where to cache parsed files (no caching if None)
+    if columns is not None:
+        columns = [weather_time_column, 'datetime'] + [column for column in columns
+                                                       if column not in (weather_time_column, 'datetime')]
+    frames = []
+    for filename in sorted(weather_list):
+        if cache_directory is None:
+            data = read_weather_file(filename)
+            if columns is not None:
+                data = data[columns]
+        else:
+            data = cached_weather_file(filename, cache_directory, columns=columns)
+        frames.append(data)
+    return pd.concat(frames, ignore_index=True)
+
+def align_weather (times, weather_data, columns, tolerance=weather_tolerance):
+    # the nearest weather record to each of times (sorted), within tolerance, in one pass over both sorted time
+    # columns (merge_asof). returns a dataframe of 'time', 'datetime' (time of the record, NaT if there is none
+    # within tolerance) and the weather columns
+    samples = pd.DataFrame({'time': np.asarray(times, dtype='datetime64[ns]')})
+    records = weather_data[['datetime'] + columns].dropna(subset=['datetime'])
+    records = records.assign(datetime=records['datetime'].astype('datetime64[ns]')).sort_values('datetime', kind='stable')
+    return pd.merge_asof(samples, records, left_on='time', right_on='datetime', direction='nearest',
+                         tolerance=tolerance)
+
+def attach_weather (data, weather_data, columns=None, tolerance=weather_tolerance):
+    # adds weather columns to every row of data (e.g. wurst samples), from the nearest weather record to its
+    # 'time' within tolerance. data itself is not changed
+    # columns = weather sensor columns to attach (all of them if None)
+    # returns the data with the weather columns, and the number of rows with no weather record within tolerance
+    # (their weather values are NaN)
+    if columns is None:
+        columns = [column for column in weather_data.columns if column not in (weather_time_column, 'datetime')]
+    times = data['time'].values.astype('datetime64[ns]')
+    # data are usually sorted by time already, which makes this a single pass
+    order = np.argsort(times, kind='stable')
+    aligned = align_weather(times[order], weather_data, columns, tolerance)
+    matched = np.empty(len(data), dtype=bool)
+    matched[order] = aligned['datetime'].notna().values
+    attached = {}
+    for column in columns:
+        attached[column] = np.empty(len(data), dtype=aligned[column].dtype)
+        attached[column][order] = aligned[column].values
+    return data.assign(**attached), int((~matched).sum())
@@ -0,0 +1,28 @@
+# shared fixtures for the tests: synthetic raw data (see cryowurst_synthetic.py), and the ingest of
+# cryowurst_raw_data_process.py pointed at a temporary directory instead of data/
+
+import os
+import pytest
+import cryowurst_raw_data_process as process
+from cryowurst_synthetic import generate_dataset
+
+
+@pytest.fixture
+def synthetic_dataset (tmp_path):
+    # 4 wurste, 21 days, hourly samples, in three weekly cloudloop files
+    return generate_dataset(str(tmp_path/'synthetic'), n_instruments=4, days=21, samples_per_day=24)
+
+@pytest.fixture
+def ingest_in (monkeypatch):
+    # returns a function that runs the ingest on <directory>/data/raw/, with the store in <directory>/data/processed/
+    def run_ingest (directory, **options):
+        directory = str(directory)
+        processed_data_directory = os.path.join(directory, 'data', 'processed')+'/'
+        monkeypatch.setattr(process, 'working_directory', directory)
+        monkeypatch.setattr(process, 'raw_data_directory', os.path.join(directory, 'data', 'raw')+'/')
+        monkeypatch.setattr(process, 'processed_data_directory', processed_data_directory)
+        monkeypatch.setattr(process, 'manifest_file_name', processed_data_directory+'ingest_manifest.json')
+        monkeypatch.setattr(process, 'store_directory', processed_data_directory+'satellite_data/')
+        monkeypatch.setattr(process, 'csv_file_name', processed_data_directory+'satellite_data_processed.csv')
+        return process.ingest(**dict({'jobs': 1}, **options))
+    return run_ingest
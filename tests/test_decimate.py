@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from cryowurst_decimate import minmax_indices, lttb_indices, decimate
+
+
+def test_minmax_keeps_extremes_of_every_bin ():
+    rng = np.random.default_rng(0)
+    x = np.sort(rng.uniform(0, 100, 5000))
+    y = rng.normal(0, 1, 5000)
+    n_bins = 50
+    positions = minmax_indices(x, y, n_bins)
+
+    assert (np.diff(positions) > 0).all()
+    bins = ((x - x.min())/(x.max() - x.min())*n_bins).astype(np.int64).clip(0, n_bins - 1)
+    for bin_number in range(n_bins):
+        in_bin = np.flatnonzero(bins == bin_number)
+        kept = np.intersect1d(positions, in_bin)
+        assert y[kept].min() == y[in_bin].min()
+        assert y[kept].max() == y[in_bin].max()
+        assert len(kept) <= 2
+
+def test_minmax_keeps_spikes_and_drops_nan ():
+    x = pd.date_range('2024-11-10', periods=1000, freq='min').values
+    y = np.zeros(1000)
+    y[123] = 50
+    y[456] = -50
+    y[789] = np.nan
+    positions = minmax_indices(x, y, 10)
+    assert 123 in positions and 456 in positions
+    assert 789 not in positions
+
+def test_short_series_are_not_decimated ():
+    x = np.arange(10)
+    y = np.arange(10, dtype=np.float64)
+    np.testing.assert_array_equal(minmax_indices(x, y, 10), np.arange(10))
+    data = pd.DataFrame({'x': x, 'y': y})
+    assert len(decimate(data, 'x', 'y', n_pixels=10)) == 10
+
+def test_lttb_keeps_end_points ():
+    x = np.arange(1000)
+    y = np.sin(x/50)
+    positions = lttb_indices(x, y, 100)
+    assert len(positions) == 100
+    assert positions[0] == 0 and positions[-1] == 999
+    assert (np.diff(positions) > 0).all()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import cryowurst_raw_data_process as process
+from cryowurst_synthetic import synthetic_wurst_packets, satellite_lines, write_cloudloop_files
+
+
+def decode_file (file_name):
+    chunks = list(process.read_hex_chunks(file_name, chunk_lines=50))
+    return process.decode_packets(np.concatenate(chunks))
+
+def test_decoded_synthetic_file_matches_packets (tmp_path):
+    packets = synthetic_wurst_packets(n_instruments=3, days=2, samples_per_day=24, seed=1)
+    file_list = write_cloudloop_files(packets, str(tmp_path), days_per_file=7)
+    wurst_data = decode_file(file_list[0])['satellite_data']
+
+    assert list(wurst_data.columns) == process.processed_columns
+    assert len(wurst_data) == len(packets)
+    expected_time = pd.to_datetime(packets['time'].astype(np.int64), unit='s')
+    assert (wurst_data['time'].values == expected_time.values).all()
+    assert list(wurst_data['UID']) == ['{0:x}'.format(uid) for uid in packets['uid']]
+    np.testing.assert_allclose(wurst_data['tmp_temp'], packets['tmp_temp']*0.0078125)
+    np.testing.assert_allclose(wurst_data['pressure'], (packets['pressure'].astype(np.int64) - 16384)*30/32768)
+    np.testing.assert_allclose(wurst_data['keller_temp'],
+                               ((packets['keller_temp'].astype(np.int64) >> 4) - 24)*0.05 - 50)
+    np.testing.assert_allclose(wurst_data['imu_x'], packets['imu_x']*(1000/16384))
+    np.testing.assert_allclose(wurst_data['tilt_pitch'], packets['tilt_pitch']*0.1)
+    np.testing.assert_array_equal(wurst_data['wurst_voltage'], packets['wurst_voltage'])
+    np.testing.assert_array_equal(wurst_data['logger_pressure'], packets['logger_pressure'])
+    np.testing.assert_array_equal(wurst_data['channel_number'], packets['channel_number'])
+
+def test_decode_known_packet ():
+    packet = np.zeros(1, dtype=process.wurst_packet_dtype)
+    packet['header'] = b'W2'
+    packet['time'] = 1732795200  # 2024-11-28 12:00:00 UTC
+    packet['uid'] = 0xcf240002
+    packet['tmp_temp'] = -8  # -0.0625 degrees C
+    packet['pressure'] = 16384 + 32768//2  # half of the 30 bar range
+    wurst_data = process.decode_packets(satellite_lines(packet))['satellite_data']
+
+    assert wurst_data['time'].iloc[0] == pd.Timestamp('2024-11-28 12:00:00')
+    assert wurst_data['UID'].iloc[0] == 'cf240002'
+    assert wurst_data['tmp_temp'].iloc[0] == -0.0625
+    assert wurst_data['pressure'].iloc[0] == 15
+
+def test_packets_are_sorted_by_header ():
+    wurst_packet = np.zeros(2, dtype=process.wurst_packet_dtype)
+    wurst_packet['header'] = b'W2'
+    wurst_packet['uid'] = 0xcf240001
+    c1_packet = np.zeros(1, dtype=process.c1_packet_dtype)
+    c1_packet['header'] = b'C1'
+    c1_packet['uid'] = 0xce240001
+    c1_packet['payload'] = np.void(bytes(range(16)))
+    unknown_line = 'ffff'+'00'*60
+    hex_lines = satellite_lines(wurst_packet, packets_per_line=1) + [c1_packet.tobytes().hex(), unknown_line]
+    tables = process.decode_packets(np.array(hex_lines, dtype=object))
+
+    assert len(tables['satellite_data']) == 2
+    assert len(tables['c1_data']) == 1
+    assert list(tables['c1_data'].columns) == process.c1_columns
+    assert tables['c1_data']['UID'].iloc[0] == 'ce240001'
+    assert tables['c1_data']['payload'].iloc[0] == bytes(range(16)).hex()
+
+def test_trailing_partial_packet_is_dropped ():
+    packets = synthetic_wurst_packets(n_instruments=1, days=1, samples_per_day=2)
+    line = satellite_lines(packets, packets_per_line=2)[0]
+    tables = process.decode_packets(np.array([line+'abcd'], dtype=object))
+    assert len(tables['satellite_data']) == 2
+
+def test_duplicate_packets_are_dropped_against_stored_data ():
+    packets = synthetic_wurst_packets(n_instruments=2, days=1, samples_per_day=4)
+    wurst_data = process.decode_packets(satellite_lines(packets))['satellite_data']
+    incoming = pd.concat([wurst_data.iloc[2:], wurst_data.iloc[[-1]]], ignore_index=True)
+
+    new_data, n_duplicates = process.drop_duplicate_packets(incoming, wurst_data.iloc[:4])
+    assert n_duplicates == 3
+    pd.testing.assert_frame_equal(new_data.reset_index(drop=True), wurst_data.iloc[4:].reset_index(drop=True))
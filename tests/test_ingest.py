@@ -0,0 +1,83 @@
+import json
+import os
+import shutil
+import pandas as pd
+from cryowurst_store import read_processed_store
+
+
+def copy_raw_files (file_list, directory):
+    raw_data_directory = os.path.join(str(directory), 'data', 'raw')
+    os.makedirs(raw_data_directory, exist_ok=True)
+    for file in file_list:
+        shutil.copy(file, raw_data_directory)
+
+def stored_data (directory):
+    return read_processed_store(os.path.join(str(directory), 'data', 'processed', 'satellite_data')+'/')
+
+def test_out_of_order_ingest_matches_full_run (tmp_path, synthetic_dataset, ingest_in):
+    cloudloop_files = synthetic_dataset['cloudloop_files']
+    assert len(cloudloop_files) == 3
+
+    copy_raw_files(cloudloop_files, tmp_path/'full')
+    ingest_in(tmp_path/'full', full=True)
+
+    # newer exports first, then the oldest one (a late or backfilled export)
+    copy_raw_files(cloudloop_files[1:], tmp_path/'out_of_order')
+    ingest_in(tmp_path/'out_of_order')
+    copy_raw_files(cloudloop_files[:1], tmp_path/'out_of_order')
+    summary = ingest_in(tmp_path/'out_of_order')
+
+    assert summary['backfill']
+    assert summary['n_new_packets']['satellite_data'] > 0
+    full_data = stored_data(tmp_path/'full')
+    out_of_order_data = stored_data(tmp_path/'out_of_order')
+    assert len(full_data) == synthetic_dataset['n_packets']
+    assert len(out_of_order_data) == len(full_data)
+    pd.testing.assert_frame_equal(out_of_order_data, full_data)
+
+    with open(tmp_path/'out_of_order'/'data'/'processed'/'ingest_manifest.json') as manifest_file:
+        manifest = json.load(manifest_file)
+    assert sorted(manifest['files']) == sorted(os.path.basename(file) for file in cloudloop_files)
+
+def test_incremental_ingest_matches_full_run (tmp_path, synthetic_dataset, ingest_in):
+    cloudloop_files = synthetic_dataset['cloudloop_files']
+    copy_raw_files(cloudloop_files, tmp_path/'full')
+    ingest_in(tmp_path/'full', full=True)
+
+    # one file at a time, with an overlapping export (the last two files again, as one file) at the end
+    for file in cloudloop_files:
+        copy_raw_files([file], tmp_path/'incremental')
+        summary = ingest_in(tmp_path/'incremental')
+        assert summary['new_files'] == [os.path.join(str(tmp_path/'incremental'), 'data', 'raw', os.path.basename(file))]
+        assert not summary['backfill']
+    overlap_file = tmp_path/'incremental'/'data'/'raw'/'cloudloop_overlap.csv'
+    with open(overlap_file, 'w') as overlap:
+        for file in cloudloop_files[1:]:
+            with open(file) as cloudloop_file:
+                overlap.write(cloudloop_file.read())
+    summary = ingest_in(tmp_path/'incremental')
+    assert summary['n_new_packets']['satellite_data'] == 0
+
+    pd.testing.assert_frame_equal(stored_data(tmp_path/'incremental'), stored_data(tmp_path/'full'))
+    # every partition is a single file
+    partition_files = {}
+    for directory, _, files in os.walk(tmp_path/'incremental'/'data'/'processed'/'satellite_data'):
+        partition_files[directory] = [file for file in files if file.endswith('.parquet')]
+    assert all(len(files) <= 1 for files in partition_files.values())
+
+def test_ingest_only_decodes_listed_files (tmp_path, synthetic_dataset, ingest_in):
+    # e.g. cryowurst_watch.py passes only files that have settled, and leaves files still being downloaded alone
+    cloudloop_files = synthetic_dataset['cloudloop_files']
+    copy_raw_files(cloudloop_files[:1], tmp_path)
+    ingest_in(tmp_path)
+    copy_raw_files(cloudloop_files[1:], tmp_path)
+    raw_files = [os.path.join(str(tmp_path), 'data', 'raw', os.path.basename(file)) for file in cloudloop_files]
+
+    summary = ingest_in(tmp_path, files=raw_files[1:2])
+    assert summary['new_files'] == raw_files[1:2]
+    with open(tmp_path/'data'/'processed'/'ingest_manifest.json') as manifest_file:
+        assert sorted(json.load(manifest_file)['files']) == sorted(os.path.basename(file) for file in raw_files[:2])
+
+    summary = ingest_in(tmp_path)
+    assert summary['new_files'] == raw_files[2:]
+    assert len(stored_data(tmp_path)) == synthetic_dataset['n_packets']
@@ -0,0 +1,38 @@
+import os
+import numpy as np
+import pytest
+import cryowurst_data_allplots as allplots
+import cryowurst_raw_data_process as process
+from cryowurst_instruments import load_instrument_registry
+from cryowurst_weather import load_weather_data
+
+
+def synthetic_plot_data (dataset, instruments):
+    chunks = [chunk for file_name in dataset['cloudloop_files'] for chunk in process.read_hex_chunks(file_name, chunk_lines=1000)]
+    all_data = process.decode_packets(np.concatenate(chunks))['satellite_data']
+    weather_data = load_weather_data(dataset['weather_files'])
+    return allplots.prepare_plot_data(all_data, weather_data, instruments=instruments)
+
+def render_all_figures (plot_data, directory, monkeypatch):
+    os.makedirs(str(directory))
+    monkeypatch.setattr(allplots, 'output_path', str(directory)+'/')
+    settings = {'formats': ['png'], 'rasterize': False, 'decimate': 'minmax'}
+    for name in allplots.figures:
+        allplots.render_figure(name, plot_data, settings)
+    return sorted(os.listdir(str(directory)))
+
+@pytest.mark.filterwarnings('ignore:No artists with labels found')
+def test_figures_are_skipped_when_registry_does_not_match_data (tmp_path, synthetic_dataset, monkeypatch):
+    # a registry whose UIDs don't match any of the wurste in the data
+    instruments = load_instrument_registry(synthetic_dataset['registry_file'])
+    instruments.index = ['ff'+uid[2:] for uid in instruments.index]
+    plot_data = synthetic_plot_data(synthetic_dataset, instruments)
+    assert len(plot_data['wurste']) == 0
+
+    saved = render_all_figures(plot_data, tmp_path/'plots', monkeypatch)
+    assert saved == ['logger_voltage.png', 'temp_curves_together.png', 'wurst_voltage.png']
+
+def test_all_figures_are_rendered (tmp_path, synthetic_dataset, monkeypatch):
+    plot_data = synthetic_plot_data(synthetic_dataset, load_instrument_registry(synthetic_dataset['registry_file']))
+    saved = render_all_figures(plot_data, tmp_path/'plots', monkeypatch)
+    assert saved == sorted(name+'.png' for name in allplots.figures)